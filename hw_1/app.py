@@ -1,21 +1,128 @@
+import argparse
+import itertools
 import sys
 import os
 
+from reader import existing_files, iter_chunks, report_error, stdin_binary
 
-def main():
-    if len(sys.argv) > 1 and not os.path.exists(sys.argv[1]):
-        line_number = 1
-        for arg in sys.argv[1:]:
-            print(f'{line_number}\t{arg}', end="\n")
-            line_number += 1
-        else:
+NUMBER_FORMATS = {"ln": b"-", "rn": b"", "rz": b"0"}
+
+
+class LineNumberer:
+    def __init__(self, out, width=1, separator="\t", start=1, increment=1,
+                 body="a", join_blank=1, number_format="rn"):
+        self.out = out
+        self.number = start
+        self.increment = increment
+        self.body = body
+        self.join_blank = join_blank
+        self.blank_run = 0
+        self.pending = []
+
+        sep = separator.encode("utf-8")
+        self.template = b"%" + NUMBER_FORMATS[number_format] + str(width).encode() + b"d" + sep.replace(b"%", b"%%") + b"%s"
+        self.unnumbered = b" " * (width + len(sep))
+
+    def feed(self, chunk: bytes):
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            # незаконченная строка копируется один раз, когда придет ее конец
+            self.pending.append(chunk)
             return
+        self.pending.append(lines[0])
+        lines[0] = b"".join(self.pending)
+        self.pending = [lines.pop()]
+        self.write_lines(lines)
+
+    def finish(self):
+        if last := b"".join(self.pending):
+            self.write_lines([last])
+        self.pending = []
+
+    def write_lines(self, lines):
+        if self.body == "a" and self.join_blank == 1:
+            numbers = itertools.count(self.number, self.increment)
+            formatted = map(self.template.__mod__, zip(numbers, lines))
+            self.number += len(lines) * self.increment
+        else:
+            formatted = map(self.format_line, lines)
+        self.out.write(b"\n".join(formatted) + b"\n")
+
+    def format_line(self, line: bytes) -> bytes:
+        if not self.should_number(line):
+            return self.unnumbered + line
+        result = self.template % (self.number, line)
+        self.number += self.increment
+        return result
+
+    def should_number(self, line: bytes) -> bool:
+        if self.body == "n":
+            return False
+        if line:
+            self.blank_run = 0
+            return True
+        if self.body == "t":
+            return False
+        self.blank_run += 1
+        if self.blank_run < self.join_blank:
+            return False
+        self.blank_run = 0
+        return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нумерация строк")
+    parser.add_argument("-w", "--number-width", type=int, default=1, help="Ширина номера строки")
+    parser.add_argument("-s", "--number-separator", default="\t", help="Разделитель между номером и строкой")
+    parser.add_argument("-v", "--starting-line-number", type=int, default=1, help="Номер первой строки")
+    parser.add_argument("-i", "--line-increment", type=int, default=1, help="Шаг нумерации")
+    parser.add_argument("-b", "--body-numbering", choices=["a", "t", "n"], default="a",
+                        help="a - все строки, t - только непустые, n - не нумеровать")
+    parser.add_argument("-l", "--join-blank-lines", type=int, default=1,
+                        help="Считать группу из N пустых строк за одну")
+    parser.add_argument("-n", "--number-format", choices=list(NUMBER_FORMATS), default="rn",
+                        help="ln - по левому краю, rn - по правому краю, rz - с ведущими нулями")
+    parser.add_argument("args", nargs="*")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    out = sys.stdout.buffer
+    numberer = LineNumberer(
+        out,
+        width=args.number_width,
+        separator=args.number_separator,
+        start=args.starting_line_number,
+        increment=args.line_increment,
+        body=args.body_numbering,
+        join_blank=args.join_blank_lines,
+        number_format=args.number_format,
+    )
+
+    if args.args and not os.path.exists(args.args[0]):
+        numberer.write_lines([arg.encode("utf-8") for arg in args.args])
+        out.flush()
+        return
+
+    if not args.args:
+        for chunk in iter_chunks(stdin_binary()):
+            numberer.feed(chunk)
+            out.flush()
+        numberer.finish()
+        out.flush()
+        return
 
-    with open(sys.argv[1], 'r', encoding="UTF-8") as f:
-        line_number = 1
-        for line in f:
-            print(f"{line_number}\t{line}", end="")
-            line_number += 1
+    for filename in existing_files("nl", args.args):
+        try:
+            with open(filename, "rb") as f:
+                for chunk in iter_chunks(f):
+                    numberer.feed(chunk)
+        except OSError as e:
+            out.flush()
+            report_error("nl", filename, e)
+        numberer.finish()
+    out.flush()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
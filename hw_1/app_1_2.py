@@ -1,30 +1,313 @@
-import sys
+import argparse
+import ctypes
+import ctypes.util
 import os
 import pathlib
+import select
+import struct
+import sys
+import time
+from collections import deque
+
+from reader import existing_files, file_stat, iter_chunks, report_error, stdin_binary
+
+
+BLOCK_SIZE = 64 * 1024
+DEFAULT_FILE_LINES = 10
+DEFAULT_STDIN_LINES = 17
+DEFAULT_SLEEP_INTERVAL = 1.0
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+    | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def tail_lines(f, count: int, block_size: int = BLOCK_SIZE) -> bytes:
+    end = f.seek(0, os.SEEK_END)
+    if count <= 0:
+        return b""
+
+    pos = end
+    blocks = []
+    newlines = 0
+
+    while pos > 0 and newlines <= count:
+        size = min(block_size, pos)
+        pos -= size
+        f.seek(pos)
+        block = f.read(size)
+        newlines += block.count(b"\n")
+        blocks.append(block)
+
+    f.seek(end)
+    data = b"".join(reversed(blocks))
+
+    idx = len(data) - 1 if data.endswith(b"\n") else len(data)
+    for _ in range(count):
+        idx = data.rfind(b"\n", 0, idx)
+        if idx == -1:
+            return data
+    return data[idx + 1:]
+
+
+def tail_bytes(f, count: int) -> bytes:
+    end = f.seek(0, os.SEEK_END)
+    if count <= 0:
+        return b""
+
+    f.seek(max(end - count, 0))
+    return f.read(end - f.tell())
+
+
+def tail_stream_lines(stream, count: int, chunk_size: int = BLOCK_SIZE) -> bytes:
+    ring = deque(maxlen=max(count, 0))
+    pending = []
+    for chunk in iter_chunks(stream, chunk_size):
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            # длинная строка собирается по кускам один раз, когда встретится перевод строки
+            pending.append(chunk)
+            continue
+        pending.append(lines[0])
+        lines[0] = b"".join(pending)
+        pending = [lines.pop()]
+        ring.extend(lines[-count:] if count > 0 else ())
+    if last := b"".join(pending):
+        ring.append(last)
+    return b"".join(line + b"\n" for line in ring)
+
+
+def tail_stream_bytes(stream, count: int, chunk_size: int = BLOCK_SIZE) -> bytes:
+    buf = bytearray()
+    for chunk in iter_chunks(stream, chunk_size):
+        buf += chunk
+        if len(buf) > count:
+            del buf[:len(buf) - max(count, 0)]
+    return bytes(buf)
+
+
+def can_seek_end(f) -> bool:
+    if not f.seekable():
+        return False
+    st = file_stat(f)
+    # файлы procfs сообщают нулевой размер и не дают перейти в конец
+    if st is not None and st.st_size == 0:
+        return False
+    pos = f.tell()
+    try:
+        f.seek(0, os.SEEK_END)
+    except OSError:
+        return False
+    f.seek(pos)
+    return True
+
+
+def print_tail(f, args, default_lines: int):
+    seekable = can_seek_end(f)
+    if args.bytes is not None:
+        data = tail_bytes(f, args.bytes) if seekable else tail_stream_bytes(f, args.bytes)
+        sys.stdout.flush()
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    else:
+        lines = args.lines if args.lines is not None else default_lines
+        print_lines(tail_lines(f, lines) if seekable else tail_stream_lines(f, lines))
+
+
+def print_lines(data: bytes):
+    # строки делятся только по \n, как при подсчете в tail_lines
+    lines = data.split(b"\n")
+    if lines[-1] == b"":
+        lines.pop()
+    sys.stdout.flush()
+    sys.stdout.buffer.write(b"".join(line.rstrip() + b"\n" for line in lines))
+    sys.stdout.buffer.flush()
+
+
+class FollowedFile:
+    def __init__(self, path: str, f):
+        self.path = path
+        self.name = pathlib.Path(path).name
+        self.f = f
+        st = os.fstat(f.fileno())
+        self.identity = (st.st_dev, st.st_ino)
+
+    def read_new(self):
+        while chunk := self.f.read(BLOCK_SIZE):
+            yield chunk
+
+    def check(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            yield from self.read_new()
+            return
+
+        if (st.st_dev, st.st_ino) != self.identity:
+            yield from self.read_new()
+            try:
+                new_f = open(self.path, "rb")
+            except FileNotFoundError:
+                return
+            self.f.close()
+            self.f = new_f
+            st = os.fstat(new_f.fileno())
+            self.identity = (st.st_dev, st.st_ino)
+            print(f"tail: {self.name}: file replaced, following new file", file=sys.stderr)
+        elif st.st_size < self.f.tell():
+            print(f"tail: {self.name}: file truncated", file=sys.stderr)
+            self.f.seek(0)
+
+        yield from self.read_new()
+
+    def close(self):
+        self.f.close()
+
+
+class PollingWatcher:
+    def __init__(self, paths, interval: float):
+        self.paths = list(paths)
+        self.interval = interval
+
+    def wait(self):
+        time.sleep(self.interval)
+        return self.paths
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    def __init__(self, paths, interval: float):
+        self.paths = list(paths)
+        self.interval = interval
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+
+        self.watched = {}
+        for path in self.paths:
+            directory = os.path.dirname(os.path.abspath(path))
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch", directory)
+            self.watched.setdefault(wd, {}).setdefault(os.fsencode(pathlib.Path(path).name), []).append(path)
+
+    def wait(self):
+        ready, _, _ = select.select([self.fd], [], [], self.interval)
+        if not ready:
+            return self.paths
+
+        changed = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, _, _, length = INOTIFY_EVENT.unpack_from(buf, offset)
+                offset += INOTIFY_EVENT.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                for path in self.watched.get(wd, {}).get(name, []):
+                    if path not in changed:
+                        changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(paths, interval: float):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths, interval)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths, interval)
+
+
+def follow(followed, interval: float = DEFAULT_SLEEP_INTERVAL):
+    by_path = {item.path: item for item in followed}
+    show_headers = len(followed) > 1
+    last_name = followed[-1].path
+    out = sys.stdout.buffer
+    watcher = make_watcher(by_path, interval)
+
+    try:
+        while True:
+            for path in watcher.wait():
+                for chunk in by_path[path].check():
+                    if show_headers and path != last_name:
+                        out.write(f"\nFile: {by_path[path].name}\n".encode("utf-8"))
+                        last_name = path
+                    out.write(chunk)
+                out.flush()
+    finally:
+        watcher.close()
+        for item in followed:
+            item.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Вывод последних строк файлов")
+    parser.add_argument("-n", "--lines", type=int, default=None, help="Количество строк")
+    parser.add_argument("-c", "--bytes", type=int, default=None, help="Количество байт")
+    parser.add_argument("-f", "--follow", action="store_true", help="Выводить новые данные по мере их появления")
+    parser.add_argument("-s", "--sleep-interval", type=float, default=DEFAULT_SLEEP_INTERVAL,
+                        help="Интервал опроса файлов в секундах")
+    parser.add_argument("files", nargs="*")
+    return parser.parse_args()
 
 
 def main():
-    file_list = []
-    if len(sys.argv) > 1:
-        for i in range(1, len(sys.argv)):
-            if os.path.exists(sys.argv[i]):
-                file_list.append(sys.argv[i])
-        for file in file_list:
-            if len(file_list) > 1:
-                print(f"File: {pathlib.Path(file).name}")
-            with open(file, 'r', encoding="UTF-8") as f:
-                lines = f.readlines()
-                last_10 = lines[-10:]
-                for line in last_10:
-                    print(line.rstrip())
-            if len(file_list) > 1 and file != file_list[-1]:
-                print()
-
-    if not file_list:
-        lines = sys.stdin.readlines()
-        last_17 = lines[-17:]
-        for line in last_17:
-            print(line.rstrip())
+    args = parse_args()
+
+    file_list = existing_files("tail", args.files)
+    followed = []
+    for file in file_list:
+        if len(file_list) > 1:
+            print(f"File: {pathlib.Path(file).name}")
+        f = None
+        try:
+            f = open(file, "rb")
+            print_tail(f, args, DEFAULT_FILE_LINES)
+        except OSError as e:
+            sys.stdout.flush()
+            report_error("tail", file, e)
+            if f is not None:
+                f.close()
+                f = None
+        if f is not None and args.follow and f.seekable():
+            followed.append(FollowedFile(file, f))
+        elif f is not None:
+            f.close()
+        if len(file_list) > 1 and file != file_list[-1]:
+            print()
+
+    if followed:
+        sys.stdout.flush()
+        try:
+            follow(followed, args.sleep_interval)
+        except KeyboardInterrupt:
+            pass
+
+    if not args.files:
+        print_tail(stdin_binary(), args, DEFAULT_STDIN_LINES)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,52 +1,249 @@
 #!/usr/bin/env python3
+import argparse
+import codecs
 import sys
 import os
-import pathlib
+from concurrent.futures import ProcessPoolExecutor
 
+from reader import (
+    CHUNK_SIZE,
+    existing_files,
+    file_stat,
+    is_regular_file,
+    iter_chunks,
+    iter_range,
+    map_file,
+    report_error,
+    stdin_binary,
+)
 
-def count_stats(text):
-    lines = text.count('\n')
-    words = len(text.split())
-    bytes_count = len(text.encode('utf-8'))
-    return lines, words, bytes_count
+SPLIT_THRESHOLD = 64 * 1024 * 1024
+TAB_SIZE = 8
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+ALL_STATS = ('lines', 'words', 'chars', 'bytes', 'max_line_length')
+DEFAULT_STATS = ('lines', 'words', 'bytes')
 
 
-def main():
-    total_lines = 0
-    total_words = 0
-    total_bytes = 0
-    file_list = []
-    
-    if len(sys.argv) > 1:
-        for i in range(1, len(sys.argv)):
-            filename = sys.argv[i]
-            if os.path.exists(filename):
-                file_list.append(filename)
+def needs_decode(stats):
+    return 'words' in stats or 'max_line_length' in stats
+
+
+def line_width(text: str, column: int = 0) -> int:
+    if '\t' not in text:
+        return column + len(text)
+    pad = column % TAB_SIZE
+    return column - pad + len((' ' * pad + text).expandtabs(TAB_SIZE))
+
+
+class StreamCounter:
+    def __init__(self, stats=DEFAULT_STATS):
+        self.stats = stats
+        self.lines = 0
+        self.words = 0
+        self.chars = 0
+        self.bytes = 0
+        self.max_line_length = 0
+        self.line_length = 0
+        self.in_word = False
+        self.starts_in_word = None
+        self.count_lines = 'lines' in stats
+        self.count_chars = 'chars' in stats
+        self.count_words_enabled = 'words' in stats
+        self.count_max_line = 'max_line_length' in stats
+        self.decoder = codecs.getincrementaldecoder('utf-8')() if needs_decode(stats) else None
+
+    def update(self, chunk: bytes):
+        self.bytes += len(chunk)
+        if self.count_lines:
+            self.lines += chunk.count(b'\n')
+        if self.count_chars:
+            self.chars += len(chunk.translate(None, CONTINUATION_BYTES))
+        if self.decoder is not None:
+            self.count_text(self.decoder.decode(chunk))
+
+    def count_text(self, text: str):
+        if self.count_words_enabled:
+            self.count_words(text)
+        if self.count_max_line:
+            self.measure_lines(text)
+
+    def count_words(self, text: str):
+        if not text:
+            return
+        if self.starts_in_word is None:
+            self.starts_in_word = not text[0].isspace()
+        words = len(text.split())
+        if self.in_word and not text[0].isspace():
+            words -= 1
+        self.words += words
+        self.in_word = not text[-1].isspace()
+
+    def measure_lines(self, text: str):
+        if not text:
+            return
+        parts = text.split('\n')
+        longest = line_width(parts[0], self.line_length)
+        if len(parts) > 1:
+            middle = parts[1:-1]
+            if '\t' in text:
+                longest = max(longest, max(map(line_width, middle), default=0))
             else:
-                print(f"wc: {filename}: No such file or directory", file=sys.stderr)
-        
+                longest = max(longest, max(map(len, middle), default=0))
+            self.line_length = line_width(parts[-1])
+        else:
+            self.line_length = longest
+        self.max_line_length = max(self.max_line_length, longest, self.line_length)
+
+    def finish(self):
+        if self.decoder is not None:
+            self.count_text(self.decoder.decode(b'', final=True))
+        return {name: getattr(self, name) for name in self.stats}
+
+
+def count_stats(f, stats=DEFAULT_STATS, chunk_size=CHUNK_SIZE):
+    counter = StreamCounter(stats)
+    for chunk in iter_chunks(f, chunk_size):
+        counter.update(chunk)
+    return counter.finish()
+
+
+def count_mapped(f, start, end, stats=DEFAULT_STATS):
+    counter = StreamCounter(stats)
+    with map_file(f) as mm:
+        for chunk in iter_range(mm, start, end):
+            counter.update(chunk)
+    return counter.finish(), counter.starts_in_word, counter.in_word
+
+
+def count_file(filename, stats=DEFAULT_STATS):
+    with open(filename, 'rb') as f:
+        if is_regular_file(f) and set(stats) <= {'bytes'} and file_stat(f).st_size:
+            return {'bytes': file_stat(f).st_size}
+        return count_stats(f, stats)
+
+
+def count_range(filename, start, end, stats=DEFAULT_STATS):
+    with open(filename, 'rb') as f:
+        return count_mapped(f, start, end, stats)
+
+
+def split_ranges(filename, parts):
+    size = os.path.getsize(filename)
+    if parts < 2 or size < SPLIT_THRESHOLD:
+        return None
+
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        for i in range(1, parts):
+            pos = max(size * i // parts, bounds[-1])
+            f.seek(pos)
+            # граница не должна попадать внутрь многобайтового символа UTF-8
+            for byte in f.read(4):
+                if byte & 0xC0 != 0x80:
+                    break
+                pos += 1
+            bounds.append(min(pos, size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def merge_counts(parts, stats=DEFAULT_STATS):
+    total = dict.fromkeys(stats, 0)
+    prev_in_word = False
+    for counts, starts_in_word, ends_in_word in parts:
+        for name in stats:
+            total[name] += counts[name]
+        if starts_in_word is None:
+            continue
+        if 'words' in stats and prev_in_word and starts_in_word:
+            total['words'] -= 1
+        prev_in_word = ends_in_word
+    return total
+
+
+def iter_counts(file_list, jobs, stats=DEFAULT_STATS):
+    if jobs < 2:
+        for filename in file_list:
+            try:
+                yield filename, count_file(filename, stats)
+            except Exception as e:
+                yield filename, e
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        tasks = []
         for filename in file_list:
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    lines, words, bytes_count = count_stats(content)
-
-                    print(f"{lines:8}{words:8}{bytes_count:8} {filename}")
-                    
-                    total_lines += lines
-                    total_words += words
-                    total_bytes += bytes_count
+                # максимальную длину строки нельзя собрать из независимых кусков файла
+                ranges = None if 'max_line_length' in stats else split_ranges(filename, jobs)
+            except Exception as e:
+                tasks.append((filename, e))
+                continue
+            if ranges is None:
+                tasks.append((filename, executor.submit(count_file, filename, stats)))
+            else:
+                tasks.append((filename, [
+                    executor.submit(count_range, filename, start, end, stats) for start, end in ranges
+                ]))
+
+        for filename, task in tasks:
+            try:
+                if isinstance(task, Exception):
+                    raise task
+                if isinstance(task, list):
+                    yield filename, merge_counts((future.result() for future in task), stats)
+                else:
+                    yield filename, task.result()
             except Exception as e:
-                print(f"wc: {filename}: {e}", file=sys.stderr)
+                yield filename, e
+
+
+def format_counts(counts, stats):
+    return "".join(f"{counts[name]:8}" for name in stats)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Подсчет строк, слов и байт")
+    parser.add_argument("-l", "--lines", action="store_true", help="Количество строк")
+    parser.add_argument("-w", "--words", action="store_true", help="Количество слов")
+    parser.add_argument("-m", "--chars", action="store_true", help="Количество символов")
+    parser.add_argument("-c", "--bytes", action="store_true", help="Количество байт")
+    parser.add_argument("-L", "--max-line-length", action="store_true", help="Длина самой длинной строки")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Количество процессов (0 - по числу ядер)")
+    parser.add_argument("files", nargs="*")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+    stats = tuple(name for name in ALL_STATS if getattr(args, name)) or DEFAULT_STATS
+    total = dict.fromkeys(stats, 0)
+    
+    if args.files:
+        file_list = existing_files('wc', args.files)
+        
+        for filename, result in iter_counts(file_list, jobs, stats):
+            if isinstance(result, Exception):
+                report_error('wc', filename, result)
+                continue
+
+            print(f"{format_counts(result, stats)} {filename}")
+
+            for name in stats:
+                if name == 'max_line_length':
+                    total[name] = max(total[name], result[name])
+                else:
+                    total[name] += result[name]
         
         if len(file_list) > 1:
-            print(f"{total_lines:8}{total_words:8}{total_bytes:8} total")
+            print(f"{format_counts(total, stats)} total")
     
     else:
         try:
-            content = sys.stdin.read()
-            lines, words, bytes_count = count_stats(content)
-            print(f"stdin: {lines:8}{words:8}{bytes_count:8}")
+            counts = count_stats(stdin_binary(), stats)
+            print(f"stdin: {format_counts(counts, stats)}")
         except KeyboardInterrupt:
             sys.exit(0)
 
@@ -0,0 +1,103 @@
+import codecs
+import io
+import mmap
+import os
+import stat
+import sys
+from contextlib import contextmanager
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_stat(f):
+    try:
+        return os.fstat(f.fileno())
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        return None
+
+
+def is_regular_file(f) -> bool:
+    st = file_stat(f)
+    return st is not None and stat.S_ISREG(st.st_mode)
+
+
+@contextmanager
+def map_file(f):
+    if os.fstat(f.fileno()).st_size == 0:
+        yield b""
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield mm
+
+
+def iter_range(mm, start: int, end: int, chunk_size: int = CHUNK_SIZE):
+    if start >= end:
+        return
+    mapped = isinstance(mm, mmap.mmap)
+    if mapped and hasattr(mmap, "MADV_SEQUENTIAL"):
+        offset = start - start % mmap.PAGESIZE
+        mm.madvise(mmap.MADV_SEQUENTIAL, offset, end - offset)
+    release = mapped and hasattr(mmap, "MADV_DONTNEED")
+    for pos in range(start, end, chunk_size):
+        stop = min(pos + chunk_size, end)
+        yield mm[pos:stop]
+        if release:
+            # прочитанные страницы больше не нужны, иначе RSS растет вместе с размером файла
+            low = pos - pos % mmap.PAGESIZE
+            high = stop - stop % mmap.PAGESIZE
+            if high > low:
+                mm.madvise(mmap.MADV_DONTNEED, low, high - low)
+
+
+def iter_stream(f, chunk_size: int = CHUNK_SIZE):
+    read = getattr(f, "read1", f.read)
+    while chunk := read(chunk_size):
+        yield chunk
+
+
+def iter_chunks(f, chunk_size: int = CHUNK_SIZE):
+    st = file_stat(f)
+    # файлы procfs и sysfs сообщают нулевой размер, хотя содержимое у них есть
+    if st is None or not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+        yield from iter_stream(f, chunk_size)
+        return
+
+    start = f.tell()
+    with map_file(f) as mm:
+        end = len(mm)
+        yield from iter_range(mm, start, end, chunk_size)
+    f.seek(max(start, end))
+
+
+def iter_text(chunks, encoding: str = "utf-8", errors: str = "strict"):
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    for chunk in chunks:
+        if text := decoder.decode(chunk):
+            yield text
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+def stdin_binary():
+    return sys.stdin.buffer
+
+
+def error_message(error) -> str:
+    if isinstance(error, OSError) and error.strerror:
+        return error.strerror
+    return str(error)
+
+
+def report_error(tool: str, filename: str, error):
+    print(f"{tool}: {filename}: {error_message(error)}", file=sys.stderr)
+
+
+def existing_files(tool: str, filenames):
+    result = []
+    for filename in filenames:
+        if os.path.exists(filename):
+            result.append(filename)
+        else:
+            report_error(tool, filename, FileNotFoundError(2, "No such file or directory"))
+    return result
@@ -0,0 +1,99 @@
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from test_gen import MB, generate_corpus
+
+HW_DIR = Path(__file__).parent.parent
+DEFAULT_RESULT_PATH = HW_DIR / "artifacts" / "bench.txt"
+
+# Процесс, который запускает утилиту, должен быть маленьким: Linux учитывает
+# память родителя до exec() в ru_maxrss дочернего процесса.
+RUNNER = """
+import os, sys, time
+start = time.perf_counter()
+pid = os.posix_spawnp(sys.argv[1], sys.argv[1:], os.environ,
+                      file_actions=[(os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0)])
+_, status, usage = os.wait4(pid, 0)
+print(time.perf_counter() - start, usage.ru_maxrss, os.waitstatus_to_exitcode(status))
+"""
+
+CORPORA = {
+    "latin": dict(cyrillic_ratio=0.0),
+    "cyrillic": dict(cyrillic_ratio=1.0),
+    "mixed": dict(cyrillic_ratio=0.5, distribution="exponential"),
+    "long-lines": dict(cyrillic_ratio=0.5, long_line_ratio=0.001, long_line_words=200000),
+    "no-newline": dict(cyrillic_ratio=0.5, trailing_newline=False),
+}
+
+
+def tool_commands(path: Path):
+    python = sys.executable
+    file = str(path)
+    return [
+        ("nl", [python, str(HW_DIR / "app.py"), file], ["nl", "-ba", file]),
+        ("tail", [python, str(HW_DIR / "app_1_2.py"), "-n", "10", file], ["tail", "-n", "10", file]),
+        ("wc", [python, str(HW_DIR / "app_1_3.py"), file], ["wc", file]),
+        ("wc -l", [python, str(HW_DIR / "app_1_3.py"), "-l", file], ["wc", "-l", file]),
+    ]
+
+
+def run(command):
+    output = subprocess.run(
+        [sys.executable, "-I", "-S", "-c", RUNNER, *command],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    elapsed, rss_kb, code = float(output[0]), int(output[1]), int(output[2])
+    if code:
+        raise subprocess.CalledProcessError(code, command)
+    return elapsed, rss_kb
+
+
+def format_result(name, elapsed, rss_kb, size):
+    return f"{name:<8} {elapsed:9.3f} с {size / MB / elapsed:10.1f} МБ/с {rss_kb / 1024:9.1f} МБ RSS"
+
+
+def bench_corpus(title, path, repeat):
+    size = path.stat().st_size
+    lines = [f"{title}: {size / MB:.1f} МБ"]
+    for tool, ours, gnu in tool_commands(path):
+        elapsed, rss = min(run(ours) for _ in range(repeat))
+        lines.append("  " + format_result(tool, elapsed, rss, size))
+        if shutil.which(gnu[0]):
+            elapsed, rss = min(run(gnu) for _ in range(repeat))
+            lines.append("  " + format_result(f"GNU {tool}", elapsed, rss, size))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк nl, tail и wc против GNU coreutils")
+    parser.add_argument("--size", type=float, default=100, help="Размер каждого корпуса в МБ")
+    parser.add_argument("--corpora", nargs="+", choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument("--files", type=Path, nargs="*", default=[], help="Готовые файлы вместо генерации")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество запусков, берется лучший")
+    parser.add_argument("--output", type=Path, default=DEFAULT_RESULT_PATH)
+    args = parser.parse_args()
+
+    _, floor_kb = run(["true"])
+    results = [f"Нижняя граница измерения RSS (процесс-запускатель): {floor_kb / 1024:.1f} МБ"]
+    for path in args.files:
+        results += bench_corpus(path.name, path, args.repeat)
+
+    if not args.files:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in args.corpora:
+                path = Path(tmp) / f"{name}.txt"
+                generate_corpus(path, int(args.size * MB), **CORPORA[name])
+                results += bench_corpus(name, path, args.repeat)
+                path.unlink()
+
+    print("\n".join(results))
+    with open(args.output, "w", encoding="UTF-8") as f:
+        f.write("\n".join(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+APP_PATH = Path(__file__).parent.parent / "app.py"
+DEFAULT_RESULT_PATH = Path(__file__).parent.parent / "artifacts" / "bench_nl.txt"
+LINE = "строка для нумерации nl\n".encode("utf-8")
+
+# Построчный вывод через print(), как было в app.py до буферизованной записи
+PRINT_PER_LINE = """
+import sys
+with open(sys.argv[1], 'r', encoding="UTF-8") as f:
+    line_number = 1
+    for line in f:
+        print(f"{line_number}\\t{line}", end="")
+        line_number += 1
+"""
+
+
+def run(command) -> float:
+    time_start = perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    return perf_counter() - time_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк nl: построчный print против пакетной записи")
+    parser.add_argument("--lines", type=int, default=5_000_000, help="Количество строк в файле")
+    parser.add_argument("--output", type=Path, default=DEFAULT_RESULT_PATH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "nl.txt"
+        with open(path, "wb") as f:
+            for _ in range(args.lines // 100_000):
+                f.write(LINE * 100_000)
+            f.write(LINE * (args.lines % 100_000))
+
+        time_print = run([sys.executable, "-c", PRINT_PER_LINE, str(path)])
+        time_bulk = run([sys.executable, str(APP_PATH), str(path)])
+
+    results = [
+        f"print по строке:   {time_print:8.3f} с, {args.lines / time_print:14,.0f} строк/с",
+        f"пакетная запись:   {time_bulk:8.3f} с, {args.lines / time_bulk:14,.0f} строк/с",
+        f"ускорение: x{time_print / time_bulk:.2f}",
+    ]
+    print("\n".join(results))
+
+    with open(args.output, "w", encoding="UTF-8") as f:
+        f.write("\n".join(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
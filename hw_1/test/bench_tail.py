@@ -0,0 +1,79 @@
+import argparse
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_1_2 import tail_lines
+
+MB = 1024 * 1024
+DEFAULT_SIZES_MB = [1, 10, 100, 1024, 10 * 1024]
+DEFAULT_RESULT_PATH = Path(__file__).parent.parent / "artifacts" / "bench_tail.txt"
+LINE = "строка для проверки производительности tail\n".encode("utf-8")
+
+
+def generate_file(path: Path, size: int):
+    block = LINE * (MB // len(LINE))
+    with open(path, "wb") as f:
+        written = 0
+        while written + len(block) <= size:
+            f.write(block)
+            written += len(block)
+        f.write(LINE * ((size - written) // len(LINE)))
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    time_start = perf_counter()
+    func(*args)
+    elapsed = perf_counter() - time_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def readlines_tail(path: Path, count: int):
+    with open(path, "r", encoding="UTF-8") as f:
+        return f.readlines()[-count:]
+
+
+def block_tail(path: Path, count: int):
+    with open(path, "rb") as f:
+        return tail_lines(f, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк tail на файлах разного размера")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES_MB, help="Размеры файлов в МБ")
+    parser.add_argument("-n", "--lines", type=int, default=10)
+    parser.add_argument("--readlines-limit", type=int, default=1024,
+                        help="Максимальный размер (МБ), для которого запускается старый вариант с readlines()")
+    parser.add_argument("--output", type=Path, default=DEFAULT_RESULT_PATH)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes:
+            path = Path(tmp) / f"tail_{size_mb}mb.txt"
+            generate_file(path, size_mb * MB)
+
+            elapsed, peak = measure(block_tail, path, args.lines)
+            line = f"{size_mb:>6} МБ  seek: {elapsed * 1000:10.3f} мс, {peak / 1024:10.1f} КБ"
+
+            if size_mb <= args.readlines_limit:
+                elapsed, peak = measure(readlines_tail, path, args.lines)
+                line += f"  readlines: {elapsed * 1000:10.3f} мс, {peak / 1024:10.1f} КБ"
+
+            print(line)
+            results.append(line)
+            path.unlink()
+
+    with open(args.output, "w", encoding="UTF-8") as f:
+        f.write("\n".join(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+MB = 1024 * 1024
+APP_PATH = Path(__file__).parent.parent / "app_1_3.py"
+DEFAULT_RESULT_PATH = Path(__file__).parent.parent / "artifacts" / "bench_wc_jobs.txt"
+LINE = "слово word ещё одно слово для wc\n".encode("utf-8")
+
+
+def generate_file(path: Path, size: int):
+    block = LINE * (MB // len(LINE))
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+
+
+def run_wc(files, jobs: int) -> float:
+    time_start = perf_counter()
+    subprocess.run(
+        [sys.executable, str(APP_PATH), "--jobs", str(jobs), *map(str, files)],
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return perf_counter() - time_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк масштабирования wc --jobs")
+    parser.add_argument("--size", type=int, default=512, help="Размер большого файла в МБ")
+    parser.add_argument("--files", type=int, default=2000, help="Количество маленьких файлов")
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", type=Path, default=DEFAULT_RESULT_PATH)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        big_file = Path(tmp) / "big.txt"
+        generate_file(big_file, args.size * MB)
+
+        small_files = []
+        for i in range(args.files):
+            path = Path(tmp) / f"small_{i}.txt"
+            path.write_bytes(LINE * 1000)
+            small_files.append(path)
+
+        for title, files in ((f"Один файл {args.size} МБ", [big_file]),
+                             (f"{args.files} файлов", small_files)):
+            results.append(title)
+            print(title)
+            base = None
+            for jobs in range(1, args.max_jobs + 1):
+                elapsed = run_wc(files, jobs)
+                base = base or elapsed
+                line = f"  jobs={jobs:<3} {elapsed:8.3f} с  ускорение x{base / elapsed:.2f}"
+                print(line)
+                results.append(line)
+
+    with open(args.output, "w", encoding="UTF-8") as f:
+        f.write("\n".join(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,117 @@
+import argparse
+import random
 from pathlib import Path
 import faker
 
+faker_en = faker.Faker(locale="en_US")
 faker = faker.Faker(locale="ru_RU")
 DEFAULT_PATH = Path(__file__).parent / "test.txt"
 DEFAULT_SECOND_PATH = Path(__file__).parent / "test2.txt"
 
+MB = 1024 * 1024
+VOCABULARY_SIZE = 5000
+LINE_POOL_SIZE = 20000
+BATCH_LINES = 10000
+LINE_DISTRIBUTIONS = ("fixed", "uniform", "exponential")
+
+
 def generate_test_file():
     with open(DEFAULT_PATH, "w", encoding="utf-8") as f:
         for i in range(100):
             f.write(faker.word() + "\n")
-            
+
     with open(DEFAULT_SECOND_PATH, "w", encoding="utf-8") as f:
         for i in range(10):
             f.write(faker.word() + "\n")
 
+
+def sample_vocabulary(size=VOCABULARY_SIZE, seed=0):
+    faker.seed_instance(seed)
+    faker_en.seed_instance(seed)
+    cyrillic = [faker.word() for _ in range(size)]
+    latin = [faker_en.word() for _ in range(size)]
+    return cyrillic, latin
+
+
+def words_per_line(rng, mean, distribution):
+    if distribution == "fixed":
+        return mean
+    if distribution == "uniform":
+        return rng.randint(0, 2 * mean)
+    return min(int(rng.expovariate(1 / mean)), 50 * mean) if mean else 0
+
+
+def build_line_pool(rng, cyrillic, latin, line_words, distribution, cyrillic_ratio,
+                    long_line_ratio, long_line_words, pool_size=LINE_POOL_SIZE):
+    pool = []
+    for _ in range(pool_size):
+        count = long_line_words if rng.random() < long_line_ratio else words_per_line(rng, line_words, distribution)
+        cyrillic_count = sum(rng.random() < cyrillic_ratio for _ in range(count))
+        words = rng.choices(cyrillic, k=cyrillic_count) + rng.choices(latin, k=count - cyrillic_count)
+        rng.shuffle(words)
+        pool.append(" ".join(words) + "\n")
+    return pool
+
+
+def generate_corpus(path, size, line_words=8, distribution="uniform", cyrillic_ratio=0.5,
+                    long_line_ratio=0.0, long_line_words=100000, trailing_newline=True, seed=0):
+    rng = random.Random(seed)
+    cyrillic, latin = sample_vocabulary(seed=seed)
+    pool = [
+        line.encode("utf-8")
+        for line in build_line_pool(rng, cyrillic, latin, line_words, distribution, cyrillic_ratio,
+                                    long_line_ratio, long_line_words)
+    ]
+
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            block = b"".join(rng.choices(pool, k=BATCH_LINES))
+            if written + len(block) > size:
+                block = block[:block.rfind(b"\n", 0, size - written) + 1]
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+
+        if not trailing_newline and written:
+            f.seek(written - 1)
+            f.truncate()
+            written -= 1
+
+    return written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Генерация тестовых файлов для утилит hw_1")
+    parser.add_argument("output", nargs="?", type=Path, help="Файл корпуса (без него создаются test.txt и test2.txt)")
+    parser.add_argument("--size", type=float, default=100, help="Размер корпуса в МБ")
+    parser.add_argument("--line-words", type=int, default=8, help="Среднее количество слов в строке")
+    parser.add_argument("--distribution", choices=LINE_DISTRIBUTIONS, default="uniform",
+                        help="Распределение длины строк")
+    parser.add_argument("--cyrillic-ratio", type=float, default=0.5, help="Доля слов на кириллице")
+    parser.add_argument("--long-line-ratio", type=float, default=0.0, help="Доля очень длинных строк")
+    parser.add_argument("--long-line-words", type=int, default=100000, help="Количество слов в длинной строке")
+    parser.add_argument("--no-trailing-newline", action="store_true", help="Не завершать файл переводом строки")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    generate_test_file()
-    print(f"Test file generated at {DEFAULT_PATH}")
+    args = parse_args()
+    if args.output is None:
+        generate_test_file()
+        print(f"Test file generated at {DEFAULT_PATH}")
+    else:
+        written = generate_corpus(
+            args.output,
+            int(args.size * MB),
+            line_words=args.line_words,
+            distribution=args.distribution,
+            cyrillic_ratio=args.cyrillic_ratio,
+            long_line_ratio=args.long_line_ratio,
+            long_line_words=args.long_line_words,
+            trailing_newline=not args.no_trailing_newline,
+            seed=args.seed,
+        )
+        print(f"Corpus of {written} bytes generated at {args.output}")
@@ -1,12 +1,11 @@
 import os
 
 from PIL import Image, ImageDraw, ImageFont
-from latexgen.latex import (
-    generate_complete_document,
+from latex import (
+    DocumentBuilder,
     generate_figure,
     generate_table,
-    save_to_file,
-    compile_latex_to_pdf_simple
+    compile_via_server
 )
 
 
@@ -79,41 +78,42 @@ def generate_image_example(image_path):
         width="0.6\\textwidth",
         scale=0.8,
         placement="h!",
-        centered=True
+        centered=True,
+        preprocess=True,
+        image_cache_dir="./artifacts/images"
     )
     
     return figure
 
 
 def create_latex_document(table_content, image_content):
-    content = f"""
-    \\section{{Введение}}
-
-    Этот документ демонстрирует возможности библиотеки \\texttt{{latexgen}} для генерации LaTeX кода.
-
-    \\section{{Таблица языков программирования}}
-
-    {table_content}
-
-    \\section{{Пример изображения}}
-
-    {image_content}
-
-    \\section{{Заключение}}
-
-    Документ был полностью сгенерирован с помощью Python библиотеки \\texttt{{latexgen}}.
-    Таблица и изображение добавлены автоматически.
-    """
-
-    document = generate_complete_document(
-        content=content,
+    document = DocumentBuilder(
         title="Пример PDF с таблицей и изображением",
         author="Студент",
         document_class="article",
         packages=["geometry"],
         add_graphics_package=True
     )
-    
+
+    document.add_section("Введение", key="intro")
+    document.add_text(
+        "Этот документ демонстрирует возможности библиотеки \\texttt{latexgen} для генерации LaTeX кода.",
+        key="intro-text"
+    )
+
+    document.add_section("Таблица языков программирования", key="table-section")
+    document.add_text(table_content, key="table")
+
+    document.add_section("Пример изображения", key="image-section")
+    document.add_text(image_content, key="image")
+
+    document.add_section("Заключение", key="conclusion")
+    document.add_text(
+        "Документ был полностью сгенерирован с помощью Python библиотеки \\texttt{latexgen}.\n"
+        "Таблица и изображение добавлены автоматически.",
+        key="conclusion-text"
+    )
+
     return document
 
 
@@ -143,13 +143,13 @@ def main():
     document = create_latex_document(table, image)
 
     tex_filename = "./artifacts/artifact_with_table_and_image.tex"
-    save_to_file(document, tex_filename)
+    document.save(tex_filename)
     print(f"LaTeX файл сохранен: {tex_filename}")
 
     print("\n5. Компиляция в PDF...")
     print("   Этап может занять некоторое время...")
     
-    compile_latex_to_pdf_simple(
+    compile_via_server(
         tex_file=tex_filename,
         output_dir="./artifacts"
     )
@@ -0,0 +1,247 @@
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from latex import (
+    DocumentBuilder,
+    compile_latex,
+    escape_latex,
+    generate_complete_document,
+    generate_figure,
+    generate_table,
+    write_table,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_RESULT_PATH = "./artifacts/bench.json"
+DEFAULT_BASELINE_PATH = "./artifacts/bench_baseline.json"
+TABLE_ROWS = [10, 1000, 100_000, 1_000_000]
+TABLE_SHAPES = {"narrow": 4, "wide": 32}
+MAX_TABLE_CELLS = 4_000_000
+IMAGE_SIZES = [(640, 480), (4000, 3000)]
+REGRESSION_THRESHOLD = 1.2
+MIN_COMPARED_TIME = 0.001
+SPECIAL = "&%$#_{}~^"
+
+
+def measure(func, repeat):
+    tracemalloc.start()
+    output_size = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        time_start = perf_counter()
+        func()
+        times.append(perf_counter() - time_start)
+    return {"time": min(times), "peak_memory": peak, "output_size": output_size}
+
+
+def text_size(text):
+    return len(text.encode("utf-8"))
+
+
+def escape_cases(rng):
+    specials = SPECIAL * 100_000
+    mixed = "".join(rng.choice(SPECIAL + "абвгдabcd ") for _ in range(1_000_000))
+    distinct = [f"{i}_{SPECIAL[i % len(SPECIAL)]}" for i in range(200_000)]
+    repeated = ["a_b & c"] * 200_000
+    return {
+        "escape/specials_900k": lambda: text_size(escape_latex(specials)),
+        "escape/mixed_1m": lambda: text_size(escape_latex(mixed)),
+        "escape/distinct_200k": lambda: sum(text_size(escape_latex(s)) for s in distinct),
+        "escape/repeated_200k": lambda: sum(text_size(escape_latex(s)) for s in repeated),
+    }
+
+
+def make_rows(rng, rows, columns):
+    if columns == TABLE_SHAPES["narrow"]:
+        return [[f"Строка_{i}", i, rng.random() * 1000, SPECIAL[i % len(SPECIAL)]] for i in range(rows)]
+    return [[rng.random() * 1000 for _ in range(columns)] for _ in range(rows)]
+
+
+def write_table_size(data):
+    buffer = io.StringIO()
+    write_table(buffer, data)
+    return text_size(buffer.getvalue())
+
+
+def table_cases(rng, table_rows):
+    cases = {}
+    for shape, columns in TABLE_SHAPES.items():
+        for rows in table_rows:
+            if rows * columns > MAX_TABLE_CELLS:
+                continue
+            data = make_rows(rng, rows, columns)
+            cases[f"table/{shape}_{rows}/generate"] = lambda data=data: text_size(generate_table(data))
+            cases[f"table/{shape}_{rows}/write"] = lambda data=data: write_table_size(data)
+            if np is not None and shape == "wide":
+                array = np.array(data)
+                cases[f"table/{shape}_{rows}/ndarray"] = lambda array=array: write_table_size(array)
+    return cases
+
+
+def figure_cases(tmp_dir):
+    cases = {"figure/plain": lambda: text_size(generate_figure("image.png", caption="Рисунок_1", width="0.5\\textwidth"))}
+    try:
+        from PIL import Image
+    except ImportError:
+        return cases
+
+    for width, height in IMAGE_SIZES:
+        path = os.path.join(tmp_dir, f"image_{width}x{height}.jpg")
+        Image.effect_noise((width, height), 64).convert("RGB").save(path, quality=95)
+
+        def preprocess(path=path):
+            cache_dir = tempfile.mkdtemp(dir=tmp_dir)
+            code = generate_figure(path, width="0.6\\textwidth", preprocess=True, image_cache_dir=cache_dir)
+            output = [name for name in os.listdir(cache_dir)]
+            return text_size(code) + sum(os.path.getsize(os.path.join(cache_dir, name)) for name in output)
+
+        cases[f"figure/preprocess_{width}x{height}"] = preprocess
+    return cases
+
+
+def document_cases(rng, tmp_dir):
+    sections = [f"\\section{{Раздел {i}}}\n\n" + "Текст абзаца. " * 200 for i in range(200)]
+    content = "\n\n".join(sections)
+    table = make_rows(rng, 10_000, TABLE_SHAPES["narrow"])
+
+    def build_document():
+        builder = DocumentBuilder(title="Отчет", packages=["geometry", "hyperref"])
+        for i, section in enumerate(sections):
+            builder.add_text(section, key=f"section-{i}")
+        builder.add_table(table, key="table")
+        return builder.save(os.path.join(tmp_dir, "builder.tex"))
+
+    return {
+        "document/complete_200_sections": lambda: text_size(
+            generate_complete_document(content, title="Отчет", packages=["geometry", "hyperref"])
+        ),
+        "document/builder_save": build_document,
+    }
+
+
+def compile_cases(rng, tmp_dir, latex_engine):
+    # DocumentBuilder сам подключает longtable для таблиц длиннее порога
+    longtable = DocumentBuilder(title="Таблица")
+    longtable.add_table(make_rows(rng, 1000, TABLE_SHAPES["narrow"]))
+    documents = {
+        "small": generate_complete_document("Короткий документ.", title="Тест"),
+        "longtable_1000": longtable.getvalue(),
+    }
+    cases = {}
+    for name, source in documents.items():
+        tex_file = os.path.join(tmp_dir, f"{name}.tex")
+        with open(tex_file, "w", encoding="utf-8") as f:
+            f.write(source)
+        for precompile in (False, True):
+            def run(tex_file=tex_file, precompile=precompile):
+                output_dir = tempfile.mkdtemp(dir=tmp_dir)
+                result = compile_latex(
+                    tex_file,
+                    output_dir=output_dir,
+                    latex_engine=latex_engine,
+                    precompile_preamble=precompile,
+                    format_cache_dir=os.path.join(tmp_dir, "formats"),
+                )
+                if not result.success:
+                    raise RuntimeError(f"{tex_file}: {result.errors}")
+                return os.path.getsize(result.pdf_path)
+
+            cases[f"compile/{name}{'/precompiled' if precompile else ''}"] = run
+    return cases
+
+
+def compare(results, baseline, threshold):
+    lines = []
+    regressions = 0
+    for name, result in results.items():
+        base = baseline.get(name)
+        if "time" not in result or base is None or "time" not in base:
+            continue
+        ratio = result["time"] / base["time"] if base["time"] else float("inf")
+        mark = ""
+        # доли миллисекунды тонут в шуме, их регрессией не считаем
+        if ratio > threshold and result["time"] - base["time"] > MIN_COMPARED_TIME:
+            mark = "  <-- регрессия"
+            regressions += 1
+        lines.append(f"{name:<40} {base['time']:9.4f} с -> {result['time']:9.4f} с  x{ratio:.2f}{mark}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк генерации и компиляции LaTeX")
+    parser.add_argument("--suites", nargs="+", default=["escape", "table", "figure", "document", "compile"],
+                        choices=["escape", "table", "figure", "document", "compile"])
+    parser.add_argument("--table-rows", type=int, nargs="+", default=TABLE_ROWS)
+    parser.add_argument("--repeat", type=int, default=3, help="Количество запусков, берется лучший")
+    parser.add_argument("--engine", default="pdflatex")
+    parser.add_argument("--output", default=DEFAULT_RESULT_PATH)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Файл с эталонными результатами")
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как эталон")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Во сколько раз время может превысить эталон")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = {}
+        if "escape" in args.suites:
+            cases.update(escape_cases(rng))
+        if "table" in args.suites:
+            cases.update(table_cases(rng, args.table_rows))
+        if "figure" in args.suites:
+            cases.update(figure_cases(tmp_dir))
+        if "document" in args.suites:
+            cases.update(document_cases(rng, tmp_dir))
+        if "compile" in args.suites:
+            if shutil.which(args.engine) is None:
+                results["compile"] = {"skipped": f"{args.engine} не найден"}
+            else:
+                cases.update(compile_cases(rng, tmp_dir, args.engine))
+
+        for name, func in cases.items():
+            results[name] = measure(func, args.repeat)
+            result = results[name]
+            print(f"{name:<40} {result['time']:9.4f} с {result['peak_memory'] / 1024 / 1024:9.1f} МБ "
+                  f"{result['output_size'] / 1024:12.1f} КБ")
+
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<40} пропущено: {result['skipped']}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="UTF-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="UTF-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="UTF-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold)
+        print("\nСравнение с эталоном:")
+        print("\n".join(lines))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
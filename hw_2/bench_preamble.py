@@ -0,0 +1,86 @@
+import argparse
+import os
+import shutil
+import tempfile
+from time import perf_counter
+
+from latex import (
+    compile_latex,
+    generate_complete_document,
+    generate_table,
+    save_to_file,
+)
+
+DEFAULT_RESULT_PATH = "./artifacts/bench_preamble.txt"
+
+
+def make_documents(directory, count):
+    paths = []
+    for i in range(count):
+        table = generate_table(
+            [[f"Строка {i}", j, j * j] for j in range(10)],
+            header=["Название", "Число", "Квадрат"],
+            caption=f"Таблица документа {i}",
+        )
+        document = generate_complete_document(
+            content=table,
+            title=f"Документ {i}",
+            packages=["geometry", "hyperref"],
+        )
+        path = os.path.join(directory, f"doc_{i}.tex")
+        save_to_file(document, path)
+        paths.append(path)
+    return paths
+
+
+def compile_all(paths, output_dir, latex_engine, precompile_preamble, format_cache_dir):
+    time_start = perf_counter()
+    for path in paths:
+        result = compile_latex(
+            path,
+            output_dir=output_dir,
+            latex_engine=latex_engine,
+            runs=1,
+            precompile_preamble=precompile_preamble,
+            format_cache_dir=format_cache_dir,
+        )
+        if not result.success:
+            raise RuntimeError(f"{path}: {result.errors}")
+    return perf_counter() - time_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк компиляции с предкомпилированной преамбулой")
+    parser.add_argument("--documents", type=int, default=20, help="Количество документов")
+    parser.add_argument("--engine", default="pdflatex")
+    parser.add_argument("--output", default=DEFAULT_RESULT_PATH)
+    args = parser.parse_args()
+
+    if shutil.which(args.engine) is None:
+        print(f"{args.engine} не найден, бенчмарк пропущен")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_documents(tmp, args.documents)
+        format_cache_dir = os.path.join(tmp, "formats")
+
+        time_full = compile_all(paths, os.path.join(tmp, "full"), args.engine, False, None)
+        time_first = compile_all(paths[:1], os.path.join(tmp, "dump"), args.engine, True, format_cache_dir)
+        time_format = compile_all(paths, os.path.join(tmp, "fmt"), args.engine, True, format_cache_dir)
+
+    per_full = time_full / args.documents
+    per_format = time_format / args.documents
+    results = [
+        f"полная преамбула:        {per_full:8.3f} с на документ",
+        f"формат + 1-й документ:   {time_first:8.3f} с (один раз)",
+        f"с готовым форматом:      {per_format:8.3f} с на документ",
+        f"экономия: {per_full - per_format:.3f} с на документ, ускорение x{per_full / per_format:.2f}",
+    ]
+    print("\n".join(results))
+
+    with open(args.output, "w", encoding="UTF-8") as f:
+        f.write("\n".join(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
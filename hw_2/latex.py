@@ -1,25 +1,92 @@
-from typing import List, Optional, Union
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, TextIO, Tuple, Union
+import base64
+import hashlib
+import io
+import json
 import os
+import re
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+LATEX_REPLACEMENTS = {
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+LATEX_ESCAPE_TABLE = str.maketrans(LATEX_REPLACEMENTS)
+ESCAPE_CACHE_SIZE = 65536
+ESCAPE_CACHE_MAX_LEN = 64
+LONGTABLE_THRESHOLD = 200
+WRITE_BATCH_ROWS = 1000
+PRINTF_SPEC_RE = re.compile(r"[+ ]?#?\d*(\.\d+)?([doxXeEfFgG])")
+
+DEFAULT_COMPILE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "latexgen")
+COMPILE_CACHE_MAX_SIZE = 512 * 1024 * 1024
+GRAPHICS_EXTENSIONS = [".pdf", ".png", ".jpg", ".jpeg", ".eps"]
+LATEX_MAX_RUNS = 4
+AUX_EXTENSIONS = [".aux", ".toc", ".lof", ".lot", ".out"]
+RERUN_RE = re.compile(r"Rerun to get|Rerun LaTeX|Please rerun|may have changed\.\s*Rerun", re.IGNORECASE)
+FATAL_MARKERS = ["Emergency stop", "Fatal error occurred", "==> Fatal error"]
+LOG_LINE_RE = re.compile(r"^l\.(\d+)\s?(.*)")
+INCLUDEGRAPHICS_RE = re.compile(r"\\includegraphics\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}")
+
+DEFAULT_FORMAT_CACHE_DIR = os.path.join(DEFAULT_COMPILE_CACHE_DIR, "formats")
+DEFAULT_COMPILE_SERVER_URL = "http://127.0.0.1:8765"
+PRECOMPILE_EXCLUDED_PACKAGES = ["hyperref"]
+ENDOFDUMP = r"\csname endofdump\endcsname"
+BEGIN_DOCUMENT_RE = re.compile(r"^[ \t]*\\begin\s*\{document\}", re.MULTILINE)
+USEPACKAGE_RE = re.compile(r"\\usepackage\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}")
+
+DEFAULT_IMAGE_CACHE_DIR = os.path.join(DEFAULT_COMPILE_CACHE_DIR, "images")
+IMAGE_DPI = 300
+DEFAULT_TEXTWIDTH = "345pt"
+JPEG_QUALITY = 90
+PALETTE_COLORS = 256
+EXIF_ORIENTATION = 0x0112
+LENGTH_RE = re.compile(r"^\s*(\d*\.?\d+)?\s*(pt|bp|mm|cm|in|\\textwidth|\\linewidth|\\columnwidth)\s*$")
+LENGTH_UNITS = {"pt": 1 / 72.27, "bp": 1 / 72, "mm": 1 / 25.4, "cm": 1 / 2.54, "in": 1.0}
+
+
+@lru_cache(maxsize=ESCAPE_CACHE_SIZE)
+def _escape_cached(text: str) -> str:
+    return text.translate(LATEX_ESCAPE_TABLE)
+
+
+def _escape(text: str) -> str:
+    # в кеш попадают только короткие ячейки, длинный текст не держится в памяти
+    if len(text) <= ESCAPE_CACHE_MAX_LEN:
+        return _escape_cached(text)
+    return text.translate(LATEX_ESCAPE_TABLE)
 
 
 def escape_latex(text: str) -> str:
-    replacements = {
-        "&": r"\&",
-        "%": r"\%",
-        "$": r"\$",
-        "#": r"\#",
-        "_": r"\_",
-        "{": r"\{",
-        "}": r"\}",
-        "~": r"\textasciitilde{}",
-        "^": r"\textasciicircum{}",
-    }
-
-    result = str(text)
-    for char, repl in replacements.items():
-        result = result.replace(char, repl)
-    return result
+    return _escape(str(text))
+
+
+def escape_column(values: Iterable[Union[str, int, float]]) -> List[str]:
+    values = [str(value) for value in values]
+    escaped = {value: _escape(value) for value in set(values)}
+    return [escaped[value] for value in values]
 
 
 def wrap_in_brackets(content: str) -> str:
@@ -36,13 +103,36 @@ def make_cell(content: str, escape: bool = True) -> str:
 
 
 def make_cells(row: List[Union[str, int, float]], escape: bool = True) -> List[str]:
-    return [make_cell(str(cell), escape) for cell in row]
+    if escape:
+        return ["{" + _escape(str(cell)) + "}" for cell in row]
+    return ["{" + str(cell) + "}" for cell in row]
 
 
 def make_row(cells: List[str], separator: str = " & ") -> str:
     return join_with_separator(cells, separator) + r" \\"
 
 
+def format_row(
+    row: List[Union[str, int, float]],
+    escape: bool = True,
+    separator: str = " & ",
+) -> str:
+    if not row:
+        return make_row([], separator)
+    values = map(str, row)
+    if escape:
+        values = map(_escape, values)
+    return "{" + ("}" + separator + "{").join(values) + r"} \\"
+
+
+def format_rows(
+    data: Iterable[List[Union[str, int, float]]],
+    escape: bool = True,
+    separator: str = " & ",
+) -> List[str]:
+    return [format_row(row, escape, separator) for row in data]
+
+
 def make_hline() -> str:
     return r"\hline"
 
@@ -59,8 +149,114 @@ def make_column_spec(
     return "{" + default + "}"
 
 
-def generate_table(
-    data: List[List[Union[str, int, float]]],
+def resolve_column_spec(
+    columns: int,
+    column_spec: Optional[str] = None,
+    column_alignments: Optional[List[str]] = None,
+) -> str:
+    if column_spec:
+        return column_spec
+    if column_alignments:
+        if len(column_alignments) != columns:
+            raise ValueError("Неверное количество выравниваний столбцов")
+        return make_column_spec(column_alignments)
+    return make_column_spec(["c"] * columns)
+
+
+def check_rows(
+    rows: Iterable[List[Union[str, int, float]]],
+    columns: int,
+) -> Iterator[List[Union[str, int, float]]]:
+    for row in rows:
+        if len(row) != columns:
+            raise ValueError("Все строки должны иметь одинаковую длину")
+        yield row
+
+
+def is_column_data(data) -> bool:
+    return isinstance(data, Mapping) or (np is not None and isinstance(data, np.ndarray))
+
+
+def format_column(
+    values: Sequence[Union[str, int, float]],
+    spec: Optional[str] = None,
+    escape: bool = True,
+) -> List[str]:
+    numeric = None
+    integral = False
+    if np is not None and isinstance(values, np.ndarray):
+        kind = values.dtype.kind
+        if kind == "f" and values.dtype.itemsize < 8 and spec is None:
+            # у float32/float16 str() короче, чем у соответствующего float
+            return values.astype(str).tolist()
+        values = values.tolist()
+        if kind in "iufb":
+            numeric = values
+            integral = kind in "iub"
+    elif values and set(map(type, values)) <= {int, float}:
+        numeric = values
+        integral = float not in set(map(type, values))
+
+    if numeric is not None:
+        if spec is None:
+            return list(map(str, numeric))
+        match = PRINTF_SPEC_RE.fullmatch(spec)
+        # % совпадает с format() только на этих спецификациях: целые коды format()
+        # не принимает для float и не допускает для них точность
+        if match and (match.group(2) not in "doxX" or (integral and match.group(1) is None)):
+            return list(map(("%" + spec).__mod__, numeric))
+
+    if spec is not None:
+        values = [format(value, spec) for value in values]
+    return escape_column(values) if escape else [str(value) for value in values]
+
+
+def table_columns(
+    data,
+    column_formats: Optional[List[Optional[str]]] = None,
+    escape: bool = True,
+) -> Tuple[List[Tuple[str, ...]], Optional[List[str]]]:
+    names = None
+    if isinstance(data, Mapping):
+        names = [str(name) for name in data]
+        columns = list(data.values())
+        if len({len(column) for column in columns}) > 1:
+            raise ValueError("Все столбцы должны иметь одинаковую длину")
+    elif np is not None and isinstance(data, np.ndarray):
+        if data.ndim != 2:
+            raise ValueError("Ожидается двумерный массив")
+        columns = list(data.T)
+    else:
+        rows = list(data)
+        if any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("Все строки должны иметь одинаковую длину")
+        columns = [list(column) for column in zip(*rows)]
+
+    if column_formats is None:
+        column_formats = [None] * len(columns)
+    elif len(column_formats) != len(columns):
+        raise ValueError("Неверное количество форматов столбцов")
+
+    formatted = [format_column(column, spec, escape) for column, spec in zip(columns, column_formats)]
+    return list(zip(*formatted)), names
+
+
+def write_rows(
+    f: TextIO,
+    rows: Iterable[List[Union[str, int, float]]],
+    indent: str,
+    escape: bool = True,
+    batch_size: int = WRITE_BATCH_ROWS,
+) -> None:
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        f.write(indent)
+        f.write(indent.join(format_rows(batch, escape)))
+
+
+def write_table(
+    f: TextIO,
+    rows: Iterable[List[Union[str, int, float]]],
     caption: Optional[str] = None,
     label: Optional[str] = None,
     column_alignments: Optional[List[str]] = None,
@@ -69,55 +265,228 @@ def generate_table(
     add_hline: bool = True,
     centered: bool = True,
     column_spec: Optional[str] = None,
+    longtable_threshold: Optional[int] = LONGTABLE_THRESHOLD,
+    column_formats: Optional[List[Optional[str]]] = None,
 ) -> str:
-    if not data:
+    if column_formats is not None or is_column_data(rows):
+        # столбцы форматируются и экранируются целиком, числовые не экранируются вовсе
+        rows, names = table_columns(rows, column_formats, escape_content)
+        if header is None:
+            header = names
+        if header and escape_content:
+            header = [escape_latex(name) for name in header]
+        escape_content = False
+
+    rows = iter(rows)
+    if longtable_threshold is None:
+        head = list(rows)
+    else:
+        head = list(islice(rows, longtable_threshold + 1))
+
+    if not head:
         raise ValueError("Данные таблицы не могут быть пустыми")
 
-    columns = len(data[0])
-    for row in data:
-        if len(row) != columns:
-            raise ValueError("Все строки должны иметь одинаковую длину")
+    columns = len(head[0])
+    col_spec = resolve_column_spec(columns, column_spec, column_alignments)
+    if header and len(header) != columns:
+        raise ValueError("Неверное количество заголовков")
 
-    if column_spec:
-        col_spec = column_spec
-    elif column_alignments:
-        if len(column_alignments) != columns:
-            raise ValueError("Неверное количество выравниваний столбцов")
-        col_spec = make_column_spec(column_alignments)
-    else:
-        col_spec = make_column_spec(["c"] * columns)
+    body = check_rows(chain(head, rows), columns)
+    if longtable_threshold is not None and len(head) > longtable_threshold:
+        _write_longtable(f, body, col_spec, caption, label, header, escape_content, add_hline)
+        return "longtable"
 
-    lines = []
+    indent = "\n        "
+    f.write(f"\\begin{{table}}{'[h!]' if centered else ''}\n    \\centering\n    \\begin{{tabular}}{col_spec}")
 
     if header:
-        if len(header) != columns:
-            raise ValueError("Неверное количество заголовков")
-        lines.append(make_row(make_cells(header, escape_content)))
+        f.write(indent + format_row(header, escape_content))
         if add_hline:
-            lines.append(make_hline())
+            f.write(indent + make_hline())
 
-    for row in data:
-        lines.append(make_row(make_cells(row, escape_content)))
+    write_rows(f, body, indent, escape_content)
 
     if add_hline:
-        lines.append(make_hline())
+        f.write(indent + make_hline())
+
+    f.write("\n    \\end{tabular}")
+    if caption:
+        f.write(f"\n    \\caption{{{escape_latex(caption)}}}")
+    if label:
+        f.write(f"\n    \\label{{{label}}}")
+    f.write("\n\\end{table}")
+    return "table"
 
-    body = "\n        ".join(lines)
 
-    table = f"""\\begin{{table}}{"[h!]" if centered else ""}
-    \\centering
-    \\begin{{tabular}}{col_spec}
-        {body}
-    \\end{{tabular}}"""
+def _write_longtable(
+    f: TextIO,
+    rows: Iterable[List[Union[str, int, float]]],
+    col_spec: str,
+    caption: Optional[str],
+    label: Optional[str],
+    header: Optional[List[str]],
+    escape_content: bool,
+    add_hline: bool,
+) -> None:
+    indent = "\n    "
+    f.write(f"\\begin{{longtable}}{col_spec}")
 
+    title = ""
     if caption:
-        table += f"\n    \\caption{{{escape_latex(caption)}}}"
+        title += f"\\caption{{{escape_latex(caption)}}}"
     if label:
-        table += f"\n    \\label{{{label}}}"
+        title += f"\\label{{{label}}}"
+    if title:
+        f.write(indent + title + r" \\")
+
+    if header:
+        head = [format_row(header, escape_content)]
+        if add_hline:
+            head.append(make_hline())
+        f.write(indent + indent.join(head) + indent + r"\endfirsthead")
+        f.write(indent + indent.join(head) + indent + r"\endhead")
+
+    write_rows(f, rows, indent, escape_content)
+
+    if add_hline:
+        f.write(indent + make_hline())
+    f.write("\n\\end{longtable}")
+
+
+def generate_table(
+    data: Union[List[List[Union[str, int, float]]], Mapping[str, Sequence], "np.ndarray"],
+    caption: Optional[str] = None,
+    label: Optional[str] = None,
+    column_alignments: Optional[List[str]] = None,
+    header: Optional[List[str]] = None,
+    escape_content: bool = True,
+    add_hline: bool = True,
+    centered: bool = True,
+    column_spec: Optional[str] = None,
+    column_formats: Optional[List[Optional[str]]] = None,
+) -> str:
+    buffer = io.StringIO()
+    write_table(
+        buffer,
+        data,
+        caption=caption,
+        label=label,
+        column_alignments=column_alignments,
+        header=header,
+        escape_content=escape_content,
+        add_hline=add_hline,
+        centered=centered,
+        column_spec=column_spec,
+        longtable_threshold=None,
+        column_formats=column_formats,
+    )
+    return buffer.getvalue()
+
+
+def length_to_inches(length: str, textwidth: str = DEFAULT_TEXTWIDTH) -> Optional[float]:
+    match = LENGTH_RE.match(length)
+    if match is None:
+        return None
+    value = float(match.group(1)) if match.group(1) else 1.0
+    unit = match.group(2)
+    if unit.startswith("\\"):
+        base = length_to_inches(textwidth)
+        return None if base is None else value * base
+    return value * LENGTH_UNITS[unit]
+
+
+def target_pixel_width(
+    width: Optional[str],
+    scale: Optional[float] = None,
+    dpi: int = IMAGE_DPI,
+    textwidth: str = DEFAULT_TEXTWIDTH,
+) -> Optional[int]:
+    inches = length_to_inches(width, textwidth) if width else None
+    if inches is None:
+        return None
+    return max(1, round(inches * (scale or 1) * dpi))
+
+
+def preprocess_image(
+    filepath: str,
+    width: Optional[str] = None,
+    scale: Optional[float] = None,
+    dpi: int = IMAGE_DPI,
+    textwidth: str = DEFAULT_TEXTWIDTH,
+    cache_dir: Optional[str] = None,
+) -> str:
+    target = target_pixel_width(width, scale, dpi, textwidth)
+    if target is None:
+        return filepath
+
+    from PIL import Image, ImageOps
+
+    with Image.open(filepath) as image:
+        # при повороте по EXIF ширина на странице - это хранимая высота
+        transposed = image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+        shown_width = image.height if transposed else image.width
+        if shown_width <= target and image.format in ("PNG", "JPEG"):
+            return filepath
+
+        cache_dir = cache_dir or DEFAULT_IMAGE_CACHE_DIR
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        digest.update(f"\0{target}".encode("utf-8"))
+        key = digest.hexdigest()
+        for ext in (".png", ".jpg"):
+            cached = os.path.join(cache_dir, key + ext)
+            if os.path.exists(cached):
+                return cached
+
+        # JPEG умеет декодироваться сразу в уменьшенном размере
+        if image.format == "JPEG":
+            if transposed:
+                image.draft("RGB", (image.width * target // image.height, target))
+            else:
+                image.draft("RGB", (target, image.height * target // image.width))
+        image = ImageOps.exif_transpose(image)
+
+        # схемы и скриншоты с малым числом цветов остаются в PNG, фотографии уходят в JPEG
+        lossless = (
+            image.mode in ("1", "P", "LA", "PA", "RGBA")
+            or "transparency" in image.info
+            or image.getcolors(PALETTE_COLORS) is not None
+        )
+        if image.width > target:
+            height = max(1, round(image.height * target / image.width))
+            image = image.resize((target, height), Image.LANCZOS)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        ext = ".png" if lossless else ".jpg"
+        path = os.path.join(cache_dir, key + ext)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if lossless:
+            image.save(tmp_path, format="PNG", optimize=True)
+        else:
+            image.convert("RGB").save(tmp_path, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _preprocess_item(item: Tuple, dpi: int, textwidth: str, cache_dir: Optional[str]) -> str:
+    return preprocess_image(*item, dpi=dpi, textwidth=textwidth, cache_dir=cache_dir)
 
-    table += "\n\\end{table}"
 
-    return table
+def preprocess_images(
+    images: Iterable[Tuple],
+    dpi: int = IMAGE_DPI,
+    textwidth: str = DEFAULT_TEXTWIDTH,
+    cache_dir: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> List[str]:
+    images = list(images)
+    job = partial(_preprocess_item, dpi=dpi, textwidth=textwidth, cache_dir=cache_dir)
+    if len(images) <= 1:
+        return [job(item) for item in images]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(job, images))
 
 
 def generate_image(
@@ -128,10 +497,16 @@ def generate_image(
     height: Optional[str] = None,
     scale: Optional[float] = None,
     centered: bool = True,
+    preprocess: bool = False,
+    dpi: int = IMAGE_DPI,
+    image_cache_dir: Optional[str] = None,
 ) -> str:
     if not filepath:
         raise ValueError("Путь к файлу не может быть пустым")
 
+    if preprocess:
+        filepath = preprocess_image(filepath, width, scale, dpi, cache_dir=image_cache_dir)
+
     options = []
     if width:
         options.append(f"width={width}")
@@ -165,6 +540,9 @@ def generate_figure(
     scale: Optional[float] = None,
     placement: str = "h!",
     centered: bool = True,
+    preprocess: bool = False,
+    dpi: int = IMAGE_DPI,
+    image_cache_dir: Optional[str] = None,
 ) -> str:
     image_code = generate_image(
         filepath=filepath,
@@ -172,6 +550,9 @@ def generate_figure(
         height=height,
         scale=scale,
         centered=False,
+        preprocess=preprocess,
+        dpi=dpi,
+        image_cache_dir=image_cache_dir,
     )
 
     figure = f"""\\begin{{figure}}[{placement}]
@@ -188,8 +569,10 @@ def generate_figure(
     return figure
 
 
-def generate_complete_document(
-    content: str,
+DOCUMENT_TAIL = "\n\n\\end{document}"
+
+
+def generate_document_head(
     title: Optional[str] = None,
     author: Optional[str] = None,
     document_class: str = "article",
@@ -208,7 +591,12 @@ def generate_complete_document(
         if pkg not in used_packages:
             used_packages.append(pkg)
 
-    preamble = "\n".join(f"\\usepackage{{{p}}}" for p in used_packages)
+    # пакеты, которые нельзя сохранить в формат, подключаются после \endofdump
+    dumped = [p for p in used_packages if p not in PRECOMPILE_EXCLUDED_PACKAGES]
+    loaded_late = [p for p in used_packages if p in PRECOMPILE_EXCLUDED_PACKAGES]
+    preamble = "\n".join(f"\\usepackage{{{p}}}" for p in dumped)
+    if loaded_late:
+        preamble += "\n" + ENDOFDUMP + "\n" + "\n".join(f"\\usepackage{{{p}}}" for p in loaded_late)
 
     title_block = ""
     if title:
@@ -227,9 +615,19 @@ def generate_complete_document(
 
 \\begin{{document}}
 
-{title_block}{content}
+{title_block}"""
+
 
-\\end{{document}}"""
+def generate_complete_document(
+    content: str,
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+    document_class: str = "article",
+    packages: List[str] = None,
+    add_graphics_package: bool = True,
+) -> str:
+    head = generate_document_head(title, author, document_class, packages, add_graphics_package)
+    return head + content + DOCUMENT_TAIL
 
 
 def save_to_file(content: str, filename: str) -> None:
@@ -237,34 +635,686 @@ def save_to_file(content: str, filename: str) -> None:
         f.write(content)
 
 
-def compile_latex_to_pdf_simple(
+@dataclass
+class Fragment:
+    key: str
+    render: Optional[Callable[[TextIO], object]] = None
+    text: Optional[str] = None
+
+    def get_text(self) -> str:
+        if self.text is not None:
+            return self.text
+        buffer = io.StringIO()
+        self.render(buffer)
+        return buffer.getvalue()
+
+    def write(self, f: TextIO) -> None:
+        if self.text is not None:
+            f.write(self.text)
+        else:
+            self.render(f)
+
+
+class DocumentBuilder:
+    def __init__(
+        self,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        document_class: str = "article",
+        packages: List[str] = None,
+        add_graphics_package: bool = True,
+    ):
+        self.title = title
+        self.author = author
+        self.document_class = document_class
+        self.packages = list(packages or [])
+        self.add_graphics_package = add_graphics_package
+        self.head = self.make_head()
+        self.fragments: List[Fragment] = []
+        self._positions = {}
+        self._next_id = 0
+        self._saved = None
+
+    def make_head(self) -> str:
+        return generate_document_head(
+            self.title, self.author, self.document_class, self.packages, self.add_graphics_package,
+        )
+
+    def require_package(self, package: str) -> None:
+        if package not in self.packages:
+            self.packages.append(package)
+            self.head = self.make_head()
+
+    def add_fragment(self, fragment: Fragment) -> "DocumentBuilder":
+        position = self._positions.get(fragment.key)
+        if position is None:
+            self._positions[fragment.key] = len(self.fragments)
+            self.fragments.append(fragment)
+        else:
+            self.fragments[position] = fragment
+        return self
+
+    def make_key(self, key: Optional[str]) -> str:
+        if key is not None:
+            return key
+        self._next_id += 1
+        return f"fragment-{self._next_id}"
+
+    def add_text(self, text: str, key: Optional[str] = None) -> "DocumentBuilder":
+        return self.add_fragment(Fragment(self.make_key(key), text=text))
+
+    def add_section(self, title: str, key: Optional[str] = None, level: str = "section") -> "DocumentBuilder":
+        return self.add_text(f"\\{level}{{{escape_latex(title)}}}", key)
+
+    def add_table(
+        self,
+        data: Iterable[List[Union[str, int, float]]],
+        key: Optional[str] = None,
+        **options,
+    ) -> "DocumentBuilder":
+        if not hasattr(data, "__len__"):
+            # итератор можно прочитать только один раз, а фрагмент выводится при каждой записи
+            data = list(data)
+        threshold = options.get("longtable_threshold", LONGTABLE_THRESHOLD)
+        rows = next(iter(data.values()), ()) if isinstance(data, Mapping) else data
+        if threshold is not None and len(rows) > threshold:
+            self.require_package("longtable")
+        return self.add_fragment(Fragment(self.make_key(key), lambda f: write_table(f, data, **options)))
+
+    def add_figure(self, filepath: str, key: Optional[str] = None, **options) -> "DocumentBuilder":
+        return self.add_fragment(Fragment(self.make_key(key), lambda f: f.write(generate_figure(filepath, **options))))
+
+    def remove(self, key: str) -> None:
+        del self.fragments[self._positions.pop(key)]
+        self._positions = {fragment.key: i for i, fragment in enumerate(self.fragments)}
+
+    def parts(self) -> List[Union[str, Fragment]]:
+        parts = [self.head]
+        for i, fragment in enumerate(self.fragments):
+            if i:
+                parts.append("\n\n")
+            parts.append(fragment.text if fragment.text is not None else fragment)
+        parts.append(DOCUMENT_TAIL)
+        return parts
+
+    def pieces(self) -> List[str]:
+        return [part if isinstance(part, str) else part.get_text() for part in self.parts()]
+
+    def write(self, f: TextIO) -> None:
+        for part in self.parts():
+            if isinstance(part, str):
+                f.write(part)
+            else:
+                part.write(f)
+
+    def getvalue(self) -> str:
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    def save(self, filename: str) -> int:
+        parts = self.parts()
+        start = 0
+        offsets = [0]
+        if self._saved is not None:
+            saved_name, saved_stat, saved_parts, saved_offsets = self._saved
+            if saved_name == filename and saved_stat == self.file_stat(filename):
+                # файл не менялся после прошлой записи: совпадающее начало не переписываем,
+                # таблицы сравниваются по фрагменту, а не по тексту
+                while start < min(len(parts), len(saved_parts)) and (
+                    parts[start] is saved_parts[start]
+                    or isinstance(parts[start], str) and parts[start] == saved_parts[start]
+                ):
+                    start += 1
+                offsets = saved_offsets[:start + 1]
+
+        with open(filename, "r+b" if start else "wb") as raw:
+            raw.seek(offsets[start])
+            f = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            for part in parts[start:]:
+                if isinstance(part, str):
+                    f.write(part)
+                else:
+                    part.write(f)
+                f.flush()
+                offsets.append(raw.tell())
+            raw.truncate()
+            f.detach()
+
+        self._saved = (filename, self.file_stat(filename), parts, offsets)
+        return offsets[-1] - offsets[start]
+
+    @staticmethod
+    def file_stat(filename: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+
+class CompileCache:
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_size: int = COMPILE_CACHE_MAX_SIZE,
+    ):
+        self.directory = directory or DEFAULT_COMPILE_CACHE_DIR
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def make_key(
+        self,
+        tex_file: str,
+        latex_engine: str,
+        options: Iterable[str] = (),
+        search_dirs: Sequence[str] = (),
+    ) -> str:
+        digest = hashlib.sha256()
+        with open(tex_file, "rb") as f:
+            source = f.read()
+        digest.update(source)
+
+        digest.update(f"\0{engine_fingerprint(latex_engine)}".encode("utf-8"))
+        for option in options:
+            digest.update(f"\0{option}".encode("utf-8"))
+
+        base_dirs = [os.getcwd(), os.path.dirname(os.path.abspath(tex_file)), *search_dirs]
+        text = source.decode("utf-8", errors="replace")
+        for match in INCLUDEGRAPHICS_RE.finditer(text):
+            image = match.group(1).strip()
+            digest.update(f"\0{image}\0".encode("utf-8"))
+            path = find_graphics_file(image, base_dirs)
+            if path is None:
+                digest.update(b"missing")
+                continue
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".pdf")
+
+    def get(self, key: str, pdf_path: str) -> bool:
+        entry = self.entry_path(key)
+        try:
+            shutil.copyfile(entry, pdf_path)
+            os.utime(entry)
+        except FileNotFoundError:
+            # запись могла быть вытеснена другим потоком
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, pdf_path: str) -> None:
+        entry = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(pdf_path, tmp_path)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def entries(self) -> List[Tuple[str, float, int]]:
+        result = []
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((entry.path, st.st_mtime, st.st_size))
+        return result
+
+    def evict(self) -> None:
+        with self.lock:
+            entries = sorted(self.entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if total <= self.max_size:
+                    break
+                total -= size
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size": sum(size for _, _, size in entries),
+        }
+
+
+def engine_fingerprint(latex_engine: str) -> str:
+    engine_path = shutil.which(latex_engine) or latex_engine
+    fingerprint = f"{latex_engine}\0{engine_path}"
+    if os.path.exists(engine_path):
+        st = os.stat(engine_path)
+        fingerprint += f"\0{st.st_size}\0{st.st_mtime_ns}"
+    return fingerprint
+
+
+def find_graphics_file(image: str, base_dirs: List[str]) -> Optional[str]:
+    names = [image] if os.path.splitext(image)[1] else [image + ext for ext in GRAPHICS_EXTENSIONS]
+    for base_dir in base_dirs:
+        for name in names:
+            path = os.path.join(base_dir, name)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+_failed_formats = set()
+
+
+def extract_preamble(source: str) -> Optional[str]:
+    end = source.find(ENDOFDUMP)
+    if end < 0:
+        match = BEGIN_DOCUMENT_RE.search(source)
+        if match is None:
+            return None
+        end = match.start()
+    preamble = source[:end]
+
+    for match in USEPACKAGE_RE.finditer(preamble):
+        names = [name.strip() for name in match.group(1).split(",")]
+        if any(name in PRECOMPILE_EXCLUDED_PACKAGES for name in names):
+            return None
+    return preamble
+
+
+def build_preamble_format(
+    preamble: str,
+    latex_engine: str = "pdflatex",
+    cache_dir: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Optional[str]:
+    cache_dir = cache_dir or DEFAULT_FORMAT_CACHE_DIR
+    digest = hashlib.sha256(preamble.encode("utf-8"))
+    digest.update(f"\0{engine_fingerprint(latex_engine)}".encode("utf-8"))
+    key = digest.hexdigest()
+    fmt_path = os.path.join(cache_dir, key + ".fmt")
+    if os.path.exists(fmt_path):
+        return fmt_path
+    if key in _failed_formats:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmp_dir:
+        save_to_file(preamble + "\\begin{document}\n\\end{document}\n", os.path.join(tmp_dir, key + ".tex"))
+        subprocess.run(
+            [
+                latex_engine,
+                "-ini",
+                "-interaction=nonstopmode",
+                f"-jobname={key}",
+                f"&{os.path.basename(latex_engine)}",
+                "mylatexformat.ltx",
+                key + ".tex",
+            ],
+            cwd=tmp_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout,
+        )
+        built = os.path.join(tmp_dir, key + ".fmt")
+        if not os.path.exists(built):
+            _failed_formats.add(key)
+            return None
+        os.replace(built, fmt_path)
+    return fmt_path
+
+
+def ensure_preamble_format(
+    tex_file: str,
+    latex_engine: str = "pdflatex",
+    cache_dir: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Optional[str]:
+    with open(tex_file, "r", encoding="utf-8", errors="replace") as f:
+        preamble = extract_preamble(f.read())
+    if preamble is None:
+        return None
+    return build_preamble_format(preamble, latex_engine, cache_dir, timeout)
+
+
+@dataclass
+class LatexError:
+    message: str
+    line: Optional[int] = None
+    context: str = ""
+
+
+@dataclass
+class CompileResult:
+    success: bool
+    pdf_path: str
+    log_path: str
+    runs: int = 0
+    cached: bool = False
+    errors: List[LatexError] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return self.success
+
+
+def snapshot_aux_files(output_dir: str, jobname: str) -> dict:
+    snapshot = {}
+    for ext in AUX_EXTENSIONS:
+        path = os.path.join(output_dir, jobname + ext)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                snapshot[ext] = hashlib.sha256(f.read()).hexdigest()
+        else:
+            snapshot[ext] = None
+    return snapshot
+
+
+def aux_files_changed(before: dict, after: dict) -> bool:
+    for ext, digest in after.items():
+        # без прежнего .aux сравнивать не с чем, изменение меток LaTeX сообщит сам
+        if ext == ".aux" and before.get(ext) is None:
+            continue
+        if before.get(ext) != digest:
+            return True
+    return False
+
+
+def parse_latex_log(log: str):
+    errors = []
+    lines = log.splitlines()
+    for i, line in enumerate(lines):
+        if not line.startswith("! "):
+            continue
+        error = LatexError(message=line[2:].strip())
+        for context in lines[i + 1:i + 10]:
+            match = LOG_LINE_RE.match(context)
+            if match:
+                error.line = int(match.group(1))
+                error.context = match.group(2).strip()
+                break
+        errors.append(error)
+
+    warnings = [line.strip() for line in lines if "Warning:" in line]
+    needs_rerun = RERUN_RE.search(log) is not None
+    fatal = any(marker in log for marker in FATAL_MARKERS)
+    return errors, warnings, needs_rerun, fatal
+
+
+def compile_latex(
     tex_file: str,
     output_dir: str = ".",
     latex_engine: str = "pdflatex",
-    runs: int = 2,
-) -> bool:
+    runs: Optional[int] = None,
+    max_runs: int = LATEX_MAX_RUNS,
+    cache: Optional[CompileCache] = None,
+    timeout: Optional[float] = None,
+    precompile_preamble: bool = False,
+    format_cache_dir: Optional[str] = None,
+    search_dirs: Sequence[str] = (),
+) -> CompileResult:
+    jobname = os.path.splitext(os.path.basename(tex_file))[0]
+    pdf_path = os.path.join(output_dir, jobname + ".pdf")
+    log_path = os.path.join(output_dir, jobname + ".log")
+    result = CompileResult(success=False, pdf_path=pdf_path, log_path=log_path)
+
     try:
         os.makedirs(output_dir, exist_ok=True)
 
-        for _ in range(runs):
+        key = None
+        if cache is not None:
+            key = cache.make_key(
+                tex_file, latex_engine,
+                ["-interaction=nonstopmode", f"runs={runs if runs is not None else 'auto'}"],
+                search_dirs,
+            )
+            if cache.get(key, pdf_path):
+                result.success = True
+                result.cached = True
+                return result
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        command = [latex_engine]
+        env = None
+        notes = []
+        if precompile_preamble:
+            fmt_path = ensure_preamble_format(tex_file, latex_engine, format_cache_dir, timeout)
+            if fmt_path is None:
+                notes.append("Преамбула не предкомпилирована, используется полная загрузка")
+            else:
+                fmt_dir, fmt_name = os.path.split(fmt_path)
+                command.append(f"-fmt={os.path.splitext(fmt_name)[0]}")
+                env = dict(os.environ, TEXFORMATS=fmt_dir + os.pathsep + os.environ.get("TEXFORMATS", ""))
+        if search_dirs:
+            env = dict(env or os.environ)
+            env["TEXINPUTS"] = os.pathsep.join(search_dirs) + os.pathsep + env.get("TEXINPUTS", "")
+        command += ["-interaction=nonstopmode", "-output-directory", output_dir, tex_file]
+
+        previous_mtime = os.path.getmtime(pdf_path) if os.path.exists(pdf_path) else None
+        snapshot = snapshot_aux_files(output_dir, jobname)
+        limit = runs if runs is not None else max_runs
+        fatal = False
+        converged = False
+
+        while result.runs < limit:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(latex_engine, timeout)
             subprocess.run(
-                [
-                    latex_engine,
-                    "-interaction=nonstopmode",
-                    "-output-directory",
-                    output_dir,
-                    tex_file,
-                ],
+                command,
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
+                timeout=remaining,
+                env=env,
             )
+            result.runs += 1
+
+            log = ""
+            if os.path.exists(log_path):
+                with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                    log = f.read()
+            result.errors, result.warnings, needs_rerun, fatal = parse_latex_log(log)
+            if fatal:
+                break
+
+            current = snapshot_aux_files(output_dir, jobname)
+            changed = aux_files_changed(snapshot, current)
+            snapshot = current
+            if runs is None and not (needs_rerun or changed):
+                converged = True
+                break
+
+        if runs is None and not converged and not fatal:
+            result.warnings.append(f"Документ не сошелся за {limit} запусков")
+        result.warnings += notes
+
+        produced = os.path.exists(pdf_path) and os.path.getmtime(pdf_path) != previous_mtime
+        result.success = produced and not fatal
+        if not result.success and not result.errors:
+            result.errors.append(LatexError(message="PDF не был создан"))
+
+        if key is not None and result.success:
+            try:
+                cache.put(key, pdf_path)
+            except OSError as e:
+                # PDF уже собран, ошибка кеша на результат не влияет
+                result.warnings.append(f"PDF не сохранен в кеш: {e}")
+
+    except subprocess.TimeoutExpired:
+        result.success = False
+        result.errors.append(LatexError(message=f"Превышено время компиляции: {timeout} с"))
+    except Exception as e:
+        result.success = False
+        result.errors.append(LatexError(message=str(e)))
+
+    return result
+
+
+@dataclass
+class CompileJob:
+    name: str
+    source: Optional[str] = None
+    tex_file: Optional[str] = None
+    search_dirs: List[str] = field(default_factory=list)
 
-        pdf_path = os.path.join(
-            output_dir,
-            os.path.splitext(os.path.basename(tex_file))[0] + ".pdf",
-        )
 
-        return os.path.exists(pdf_path)
+def make_compile_job(item: Union[str, CompileJob], used_names: Optional[set] = None) -> CompileJob:
+    if isinstance(item, CompileJob):
+        job = item
+        if used_names is not None and job.name in used_names:
+            raise ValueError(f"Повторяющееся имя задания: {job.name}")
+    else:
+        name = base = os.path.splitext(os.path.basename(item))[0]
+        if used_names is not None and name in used_names:
+            # файлы с одинаковым именем из разных каталогов получают свои каталоги сборки
+            digest = hashlib.sha256(os.path.abspath(item).encode("utf-8")).hexdigest()[:8]
+            name = f"{base}-{digest}"
+            number = 1
+            while name in used_names:
+                name = f"{base}-{digest}-{number}"
+                number += 1
+        job = CompileJob(name=name, tex_file=item)
+
+    if used_names is not None:
+        used_names.add(job.name)
+    return job
+
+
+def run_compile_job(
+    job: CompileJob,
+    output_dir: str,
+    latex_engine: str,
+    timeout: Optional[float],
+    cache: Optional[CompileCache],
+    precompile_preamble: bool = False,
+) -> CompileResult:
+    job_dir = os.path.join(output_dir, job.name)
+    os.makedirs(job_dir, exist_ok=True)
+    tex_file = job.tex_file
+    if tex_file is None:
+        tex_file = os.path.join(job_dir, job.name + ".tex")
+        save_to_file(job.source or "", tex_file)
+    return compile_latex(
+        tex_file,
+        output_dir=job_dir,
+        latex_engine=latex_engine,
+        cache=cache,
+        timeout=timeout,
+        precompile_preamble=precompile_preamble,
+        search_dirs=job.search_dirs,
+    )
+
+
+def compile_batch(
+    jobs: Iterable[Union[str, CompileJob]],
+    output_dir: str = ".",
+    latex_engine: str = "pdflatex",
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    cache: Optional[CompileCache] = None,
+    precompile_preamble: bool = False,
+) -> Iterator[Tuple[CompileJob, CompileResult]]:
+    max_workers = max_workers or os.cpu_count() or 1
+    jobs = iter(jobs)
+    used_names = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        while True:
+            while len(pending) < max_workers * 2:
+                item = next(jobs, None)
+                if item is None:
+                    break
+                job = make_compile_job(item, used_names)
+                future = executor.submit(
+                    run_compile_job, job, output_dir, latex_engine, timeout, cache, precompile_preamble,
+                )
+                pending[future] = job
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+def compile_latex_to_pdf_simple(
+    tex_file: str,
+    output_dir: str = ".",
+    latex_engine: str = "pdflatex",
+    runs: Optional[int] = None,
+    cache: Optional[CompileCache] = None,
+    precompile_preamble: bool = False,
+) -> bool:
+    return compile_latex(
+        tex_file,
+        output_dir=output_dir,
+        latex_engine=latex_engine,
+        runs=runs,
+        cache=cache,
+        precompile_preamble=precompile_preamble,
+    ).success
+
+
+def compile_via_server(
+    tex_file: str,
+    output_dir: str = ".",
+    latex_engine: str = "pdflatex",
+    server_url: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> bool:
+    server_url = server_url or os.environ.get("LATEXGEN_SERVER", DEFAULT_COMPILE_SERVER_URL)
+    jobname = os.path.splitext(os.path.basename(tex_file))[0]
+    with open(tex_file, "r", encoding="utf-8") as f:
+        source = f.read()
+    payload = json.dumps({
+        "name": jobname,
+        "source": source,
+        "directories": [os.getcwd(), os.path.dirname(os.path.abspath(tex_file))],
+    }).encode("utf-8")
+    request = urllib.request.Request(
+        server_url.rstrip("/") + "/compile",
+        data=payload,
+        headers={"Content-Type": "application/json"},
+    )
 
-    except Exception:
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            answer = json.loads(response.read())
+    except (OSError, ValueError):
+        # сервер не запущен или ответил не по протоколу, компилируем сами
+        return compile_latex_to_pdf_simple(tex_file, output_dir=output_dir, latex_engine=latex_engine)
+
+    if not answer.get("success"):
         return False
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, jobname + ".pdf"), "wb") as f:
+        f.write(base64.b64decode(answer["pdf"]))
+    return True
+
@@ -0,0 +1,203 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from latex import (
+    CompileCache,
+    CompileJob,
+    build_preamble_format,
+    extract_preamble,
+    generate_complete_document,
+    run_compile_job,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+LATENCY_WINDOW = 1000
+
+
+class CompileServer:
+    def __init__(self, output_dir, latex_engine="pdflatex", workers=None, timeout=None, cache=None):
+        self.output_dir = output_dir
+        self.latex_engine = latex_engine
+        self.timeout = timeout
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.deduplicated = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = time.monotonic()
+
+    def warm_up(self):
+        # формат для преамбулы generate_complete_document собирается до первых заданий
+        if shutil.which(self.latex_engine) is None:
+            return False
+        preamble = extract_preamble(generate_complete_document(""))
+        return build_preamble_format(preamble, self.latex_engine, timeout=self.timeout) is not None
+
+    def submit(self, source, directories=()):
+        digest = hashlib.sha256(source.encode("utf-8"))
+        for directory in directories:
+            digest.update(f"\0{directory}".encode("utf-8"))
+        key = digest.hexdigest()
+
+        with self.lock:
+            future = self.jobs.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            future = Future()
+            self.jobs[key] = future
+            self.queued += 1
+        self.executor.submit(self.run, key, source, list(directories), future, time.monotonic())
+        return future
+
+    def run(self, key, source, directories, future, submitted):
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+        success = False
+        try:
+            job = CompileJob(name=key[:16], source=source, search_dirs=directories)
+            result = run_compile_job(
+                job, self.output_dir, self.latex_engine, self.timeout, self.cache, precompile_preamble=True,
+            )
+            pdf = None
+            if result.success:
+                with open(result.pdf_path, "rb") as f:
+                    pdf = f.read()
+            success = result.success
+            future.set_result((result, pdf))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            shutil.rmtree(os.path.join(self.output_dir, key[:16]), ignore_errors=True)
+            with self.lock:
+                self.running -= 1
+                self.completed += 1
+                if not success:
+                    self.failed += 1
+                self.latencies.append(time.monotonic() - submitted)
+                self.jobs.pop(key, None)
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics = {
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "deduplicated": self.deduplicated,
+                "uptime": time.monotonic() - self.started,
+            }
+        if latencies:
+            metrics["latency_avg"] = sum(latencies) / len(latencies)
+            metrics["latency_p50"] = latencies[len(latencies) // 2]
+            metrics["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            metrics["latency_max"] = latencies[-1]
+        if self.cache is not None:
+            metrics["cache"] = self.cache.stats()
+        return metrics
+
+
+class CompileRequestHandler(BaseHTTPRequestHandler):
+    compile_server = None
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self.send_json(200, self.compile_server.metrics())
+        else:
+            self.send_json(404, {"error": "Неизвестный путь"})
+
+    def do_POST(self):
+        if self.path != "/compile":
+            self.send_json(404, {"error": "Неизвестный путь"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            source = job["source"]
+            directories = job.get("directories", [])
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Некорректное задание: {e}"})
+            return
+
+        try:
+            result, pdf = self.compile_server.submit(source, directories).result()
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+
+        self.send_json(200, {
+            "success": result.success,
+            "cached": result.cached,
+            "runs": result.runs,
+            "errors": [error.__dict__ for error in result.errors],
+            "warnings": result.warnings,
+            "pdf": base64.b64encode(pdf).decode("ascii") if pdf is not None else None,
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Сервер компиляции LaTeX")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Количество одновременных компиляций")
+    parser.add_argument("--engine", default="pdflatex")
+    parser.add_argument("--timeout", type=float, default=None, help="Ограничение времени одной компиляции, с")
+    parser.add_argument("--output-dir", default=None, help="Каталог для временных файлов заданий")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кеш скомпилированных PDF")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="latexgen-server-")
+    cache = None if args.no_cache else CompileCache()
+    server = CompileServer(output_dir, args.engine, args.workers, args.timeout, cache)
+
+    if server.warm_up():
+        print("Формат преамбулы подготовлен")
+    CompileRequestHandler.compile_server = server
+    httpd = ThreadingHTTPServer((args.host, args.port), CompileRequestHandler)
+    print(f"Сервер компиляции слушает http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        server.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
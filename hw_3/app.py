@@ -1,5 +1,54 @@
+import operator
+from array import array
+from itertools import chain
+
 import numpy as np
 
+try:
+    from math import sumprod as dot
+except ImportError:
+    def dot(left, right):
+        return sum(map(operator.mul, left, right))
+
+MATMUL_TILE = 64
+
+
+def tiled_product(rows, columns):
+    result = [[0] * len(columns) for _ in rows]
+
+    # блок столбцов остается в кеше, пока по нему проходят все строки
+    for start in range(0, len(columns), MATMUL_TILE):
+        block = columns[start:start + MATMUL_TILE]
+        for row, result_row in zip(rows, result):
+            result_row[start:start + MATMUL_TILE] = [dot(row, column) for column in block]
+    return result
+
+
+def pack_values(values):
+    kinds = set(map(type, values))
+    if kinds == {float}:
+        return array("d", values)
+    if kinds == {int}:
+        try:
+            return array("q", values)
+        except OverflowError:
+            pass
+    # смешанные типы и числа больше int64 остаются обычным списком
+    return values
+
+
+def combine_buffers(op, left, right):
+    left_code = getattr(left, "typecode", None)
+    right_code = getattr(right, "typecode", None)
+    if left_code is not None and right_code is not None:
+        if "d" in (left_code, right_code):
+            return array("d", map(op, left, right))
+        try:
+            return array("q", map(op, left, right))
+        except OverflowError:
+            pass
+    return pack_values(list(map(op, left, right)))
+
 
 class Matrix:
     def __init__(self, data):
@@ -17,7 +66,7 @@ class Matrix:
     
     def __add__(self, other):
         if not isinstance(other, Matrix):
-            raise TypeError("Можно складывать только матрицы")
+            return NotImplemented
         
         if self.rows != other.rows or self.cols != other.cols:
             raise ValueError(
@@ -35,7 +84,7 @@ class Matrix:
     
     def __mul__(self, other):
         if not isinstance(other, Matrix):
-            raise TypeError("Поэлементное умножение определено только для матриц")
+            return NotImplemented
         
         if self.rows != other.rows or self.cols != other.cols:
             raise ValueError(
@@ -53,7 +102,7 @@ class Matrix:
     
     def __matmul__(self, other):
         if not isinstance(other, Matrix):
-            raise TypeError("Матричное умножение определено только для матриц")
+            return NotImplemented
         
         if self.cols != other.rows:
             raise ValueError(
@@ -61,17 +110,7 @@ class Matrix:
                 f"{self.rows}x{self.cols} @ {other.rows}x{other.cols}"
             )
         
-        result = []
-        for i in range(self.rows):
-            row = []
-            for j in range(other.cols):
-                sum_val = 0
-                for k in range(self.cols):
-                    sum_val += self.data[i][k] * other.data[k][j]
-                row.append(sum_val)
-            result.append(row)
-        
-        return Matrix(result)
+        return Matrix(tiled_product(self.data, list(zip(*other.data))))
     
     def __str__(self) -> str:
         return self.__repr__()
@@ -90,6 +129,130 @@ class Matrix:
             return f"Matrix({rows}x{cols})"
 
 
+class FlatMatrix:
+    __slots__ = ("rows", "cols", "buffer")
+
+    def __init__(self, data):
+        if not data or not isinstance(data[0], list):
+            raise ValueError("Матрица должна быть двумерным списком")
+
+        self.rows = len(data)
+        self.cols = len(data[0])
+
+        for row in data:
+            if len(row) != self.cols:
+                raise ValueError("Все строки матрицы должны иметь одинаковую длину")
+
+        self.buffer = pack_values(list(chain.from_iterable(data)))
+
+    @classmethod
+    def from_buffer(cls, rows, cols, buffer):
+        matrix = cls.__new__(cls)
+        matrix.rows = rows
+        matrix.cols = cols
+        matrix.buffer = buffer
+        return matrix
+
+    @property
+    def data(self):
+        # копия значений: запись в m.data[i][j] буфер не меняет, для этого m[i, j] = value
+        if not self.cols:
+            return [[] for _ in range(self.rows)]
+        return [self.row(i) for i in range(self.rows)]
+
+    def index(self, key):
+        i, j = key
+        if not (0 <= i < self.rows and 0 <= j < self.cols):
+            raise IndexError(f"Индекс ({i}, {j}) вне матрицы {self.rows}x{self.cols}")
+        return i * self.cols + j
+
+    def __getitem__(self, key):
+        return self.buffer[self.index(key)]
+
+    def __setitem__(self, key, value):
+        position = self.index(key)
+        if isinstance(self.buffer, array) and type(value) is not type(self.buffer[0]):
+            # значение другого типа не помещается в типизированный буфер без потерь
+            self.buffer = self.buffer.tolist()
+        self.buffer[position] = value
+
+    def row(self, i):
+        row = self.buffer[i * self.cols:(i + 1) * self.cols]
+        return row.tolist() if isinstance(row, array) else row
+
+    def column(self, j):
+        return self.buffer[j::self.cols]
+
+    def flat_values(self, other, symbol):
+        if self.rows != other.rows or self.cols != other.cols:
+            raise ValueError(
+                f"Несовместимые размеры: {self.rows}x{self.cols} {symbol} {other.rows}x{other.cols}"
+            )
+
+        if isinstance(other, FlatMatrix):
+            return other.buffer
+        return list(chain.from_iterable(other.data))
+
+    def __add__(self, other):
+        if not isinstance(other, (FlatMatrix, Matrix)):
+            return NotImplemented
+        values = self.flat_values(other, "+")
+        return FlatMatrix.from_buffer(self.rows, self.cols, combine_buffers(operator.add, self.buffer, values))
+
+    def __mul__(self, other):
+        if not isinstance(other, (FlatMatrix, Matrix)):
+            return NotImplemented
+        values = self.flat_values(other, "*")
+        return FlatMatrix.from_buffer(self.rows, self.cols, combine_buffers(operator.mul, self.buffer, values))
+
+    def __matmul__(self, other):
+        if not isinstance(other, (FlatMatrix, Matrix)):
+            return NotImplemented
+
+        if self.cols != other.rows:
+            raise ValueError(
+                f"Несовместимые размеры для умножения: "
+                f"{self.rows}x{self.cols} @ {other.rows}x{other.cols}"
+            )
+
+        if isinstance(other, FlatMatrix):
+            columns = [other.column(j) for j in range(other.cols)]
+        else:
+            columns = list(zip(*other.data))
+        rows = [self.buffer[i * self.cols:(i + 1) * self.cols] for i in range(self.rows)]
+        result = tiled_product(rows, columns)
+        return FlatMatrix.from_buffer(self.rows, other.cols, pack_values(list(chain.from_iterable(result))))
+
+    def __radd__(self, other):
+        if not isinstance(other, Matrix):
+            return NotImplemented
+        values = self.flat_values(other, "+")
+        return FlatMatrix.from_buffer(self.rows, self.cols, combine_buffers(operator.add, values, self.buffer))
+
+    def __rmul__(self, other):
+        if not isinstance(other, Matrix):
+            return NotImplemented
+        values = self.flat_values(other, "*")
+        return FlatMatrix.from_buffer(self.rows, self.cols, combine_buffers(operator.mul, values, self.buffer))
+
+    def __rmatmul__(self, other):
+        if not isinstance(other, Matrix):
+            return NotImplemented
+
+        if other.cols != self.rows:
+            raise ValueError(
+                f"Несовместимые размеры для умножения: "
+                f"{other.rows}x{other.cols} @ {self.rows}x{self.cols}"
+            )
+
+        columns = [self.column(j) for j in range(self.cols)]
+        result = tiled_product(other.data, columns)
+        return FlatMatrix.from_buffer(other.rows, self.cols, pack_values(list(chain.from_iterable(result))))
+
+    __str__ = Matrix.__str__
+    __repr__ = Matrix.__repr__
+
+
 def save_matrix_to_file(matrix, filename):
     with open(filename, 'w+', encoding='utf-8') as f:
         for row in matrix.data:
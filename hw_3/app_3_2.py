@@ -1,21 +1,114 @@
+import numbers
+
 import numpy as np
 
 
+def unwrap(value):
+    if isinstance(value, NDArrayOperatorsMixin):
+        return value.data
+    if type(value) in (tuple, list):
+        return type(value)(unwrap(item) for item in value)
+    if type(value) is dict:
+        return {key: unwrap(item) for key, item in value.items()}
+    return value
+
+
+def wrap(cls, result):
+    # оборачиваются только матрицы float64, остальное (маски, векторы, скаляры) возвращается как есть
+    if isinstance(result, np.ndarray) and result.ndim == 2 and result.dtype == np.float64:
+        return cls(result)
+    if type(result) in (tuple, list):
+        return type(result)(wrap(cls, item) for item in result)
+    return result
+
+
+def defers(value):
+    # объекты со своим __array_ufunc__ обрабатывают операцию сами
+    if isinstance(value, (np.ndarray, numbers.Number, NDArrayOperatorsMixin)):
+        return False
+    return hasattr(type(value), "__array_ufunc__")
+
+
 class NDArrayOperatorsMixin:
+    def apply(self, ufunc, other, out=None, reflected=False):
+        if defers(other):
+            return NotImplemented
+        operands = (unwrap(other), self.data) if reflected else (self.data, unwrap(other))
+        if out is None:
+            return wrap(self.__class__, ufunc(*operands))
+        ufunc(*operands, out=unwrap(out))
+        return out
+
+    def add(self, other, out=None):
+        return self.apply(np.add, other, out)
+
+    def mul(self, other, out=None):
+        return self.apply(np.multiply, other, out)
+
+    def matmul(self, other, out=None):
+        return self.apply(np.matmul, other, out)
+
+    def sub(self, other, out=None):
+        return self.apply(np.subtract, other, out)
+
+    def truediv(self, other, out=None):
+        return self.apply(np.divide, other, out)
+
     def __add__(self, other):
-        return self.__class__(self.data + other.data)
+        return self.add(other)
     
     def __mul__(self, other):
-        return self.__class__(self.data * other.data)
+        return self.mul(other)
     
     def __matmul__(self, other):
-        return self.__class__(self.data @ other.data)
+        return self.matmul(other)
     
     def __sub__(self, other):
-        return self.__class__(self.data - other.data)
+        return self.sub(other)
     
     def __truediv__(self, other):
-        return self.__class__(self.data / other.data)
+        return self.truediv(other)
+
+    def __radd__(self, other):
+        return self.apply(np.add, other, reflected=True)
+
+    def __rmul__(self, other):
+        return self.apply(np.multiply, other, reflected=True)
+
+    def __rmatmul__(self, other):
+        return self.apply(np.matmul, other, reflected=True)
+
+    def __rsub__(self, other):
+        return self.apply(np.subtract, other, reflected=True)
+
+    def __rtruediv__(self, other):
+        return self.apply(np.divide, other, reflected=True)
+
+    def __iadd__(self, other):
+        return self.add(other, out=self)
+
+    def __imul__(self, other):
+        return self.mul(other, out=self)
+
+    def __imatmul__(self, other):
+        other = unwrap(other)
+        shape = np.shape(other)
+        if len(shape) != 2:
+            # с вектором результат уже не матрица, а out= размножил бы его по строкам
+            raise ValueError(
+                f"Несовместимые размеры для умножения: {self.data.shape} @= {shape}"
+            )
+        if shape[1] != self.data.shape[1]:
+            # результат другой формы в старый буфер не помещается
+            self.data = self.data @ other
+            return self
+        return self.matmul(other, out=self)
+
+    def __isub__(self, other):
+        return self.sub(other, out=self)
+
+    def __itruediv__(self, other):
+        return self.truediv(other, out=self)
 
 
 class WriteToFileMixin:
@@ -71,7 +164,28 @@ class MatrixMixin(
     GetterSetterMixin
 ):
     def __init__(self, data: np.ndarray):
-        self.data = np.array(data, dtype=np.float64)
+        # массив float64 оборачивается без копирования
+        self.data = np.asarray(data, dtype=np.float64)
+    
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.data, dtype=dtype)
+        return np.asarray(self.data, dtype=dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        if any(map(defers, inputs + (out or ()))):
+            return NotImplemented
+        if out is not None:
+            kwargs["out"] = unwrap(out)
+        result = getattr(ufunc, method)(*unwrap(inputs), **kwargs)
+        if out is not None:
+            return out[0] if len(out) == 1 else out
+        return wrap(self.__class__, result)
+
+    def __array_function__(self, func, types, args, kwargs):
+        if not all(issubclass(t, (np.ndarray, MatrixMixin)) for t in types):
+            return NotImplemented
+        return wrap(self.__class__, func(*unwrap(args), **unwrap(kwargs)))
     
     def __repr__(self):
         return f"MatrixMixin({self.rows}x{self.cols})"
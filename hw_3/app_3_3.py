@@ -3,8 +3,12 @@ from time import perf_counter_ns
 
 import numpy as np
 
+from app import FlatMatrix
+
 
 class HashMixin:
+    __slots__ = ()
+
     def __hash__(self):
         """
         Алгоритм:
@@ -52,7 +56,7 @@ class MatrixWithHash(HashMixin):
     
     def __eq__(self, other):
         if not isinstance(other, MatrixWithHash):
-            return False
+            return NotImplemented
         
         if self.rows != other.rows or self.cols != other.cols:
             return False
@@ -90,6 +94,51 @@ class MatrixWithHash(HashMixin):
         
         return MatrixWithHash(result)
 
+class FlatMatrixWithHash(HashMixin, FlatMatrix):
+    __slots__ = ("_hash",)
+
+    def __init__(self, data):
+        super().__init__(data)
+        self._hash = None
+
+    @classmethod
+    def from_buffer(cls, rows, cols, buffer):
+        matrix = super().from_buffer(rows, cols, buffer)
+        matrix._hash = None
+        return matrix
+
+    def __repr__(self):
+        return f"Matrix({self.rows}x{self.cols}, hash={hash(self)})"
+
+    def __eq__(self, other):
+        if not isinstance(other, (FlatMatrixWithHash, MatrixWithHash)):
+            return NotImplemented
+
+        if self.rows != other.rows or self.cols != other.cols:
+            return False
+
+        if isinstance(other, FlatMatrixWithHash) and type(self.buffer) is type(other.buffer):
+            return self.buffer == other.buffer
+        return self.data == other.data
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = super().__hash__()
+        return self._hash
+
+    def __setitem__(self, key, value):
+        # хеш закеширован и служит ключом кеша умножения
+        raise TypeError("Матрица с хешем неизменяема")
+
+    @lru_cache(maxsize=128)
+    def __matmul__(self, other):
+        if not isinstance(other, FlatMatrixWithHash):
+            raise TypeError("Матричное умножение определено только для матриц")
+
+        result = FlatMatrix.__matmul__(self, other)
+        return FlatMatrixWithHash.from_buffer(result.rows, result.cols, result.buffer)
+
+
 def save_matrix(matrix, filename):
     with open(filename, 'w', encoding='utf-8') as f:
         for row in matrix.data:
@@ -0,0 +1,413 @@
+import operator
+import os
+from array import array
+from itertools import chain, repeat
+from math import exp
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+from app import FlatMatrix, Matrix, pack_values
+from app_3_2 import MatrixMixin
+
+# при большей ожидаемой доле ненулевых элементов результат хранится плотно
+DENSE_RESULT_THRESHOLD = 0.15
+DENSE_TYPES = (Matrix, FlatMatrix, MatrixMixin)
+BENCH_SIZE = 200
+BENCH_DENSITIES = [0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5]
+DEFAULT_RESULT_PATH = "./artifacts/sparse_crossover.txt"
+
+
+def as_list(values):
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def zero_of(values):
+    return 0.0 if any(isinstance(x, float) for x in values) else 0
+
+
+def dense_rows(matrix):
+    if isinstance(matrix, MatrixMixin):
+        return matrix.data.tolist()
+    return matrix.data
+
+
+def dense_zero(matrix):
+    if isinstance(matrix, MatrixMixin):
+        return 0.0
+    if isinstance(matrix, FlatMatrix):
+        return zero_of(matrix.buffer)
+    return zero_of(chain.from_iterable(matrix.data))
+
+
+def dense_values(matrix, row_ids, col_ids):
+    if isinstance(matrix, MatrixMixin):
+        return matrix.data[row_ids, col_ids].tolist()
+    if isinstance(matrix, FlatMatrix):
+        buffer, cols = matrix.buffer, matrix.cols
+        return [buffer[i * cols + j] for i, j in zip(row_ids, col_ids)]
+    data = matrix.data
+    return [data[i][j] for i, j in zip(row_ids, col_ids)]
+
+
+class SparseMatrix:
+    __slots__ = ("rows", "cols", "indptr", "indices", "values", "zero")
+
+    def __init__(self, data):
+        if not data or not isinstance(data[0], list):
+            raise ValueError("Матрица должна быть двумерным списком")
+
+        self.rows = len(data)
+        self.cols = len(data[0])
+
+        for row in data:
+            if len(row) != self.cols:
+                raise ValueError("Все строки матрицы должны иметь одинаковую длину")
+
+        indptr = [0]
+        indices = []
+        values = []
+        for row in data:
+            for j, value in enumerate(row):
+                if value:
+                    indices.append(j)
+                    values.append(value)
+            indptr.append(len(indices))
+
+        self.indptr = array("q", indptr)
+        self.indices = array("q", indices)
+        self.values = pack_values(values)
+        # тип нуля сохраняет int/float при обратном переводе в плотную матрицу
+        self.zero = zero_of(chain.from_iterable(data))
+
+    @classmethod
+    def from_csr(cls, rows, cols, indptr, indices, values, zero=0):
+        matrix = cls.__new__(cls)
+        matrix.rows = rows
+        matrix.cols = cols
+        matrix.indptr = array("q", indptr)
+        matrix.indices = array("q", indices)
+        matrix.values = pack_values(as_list(values))
+        matrix.zero = zero
+        return matrix
+
+    @classmethod
+    def from_row_dicts(cls, rows, cols, row_dicts, zero=0):
+        indptr = [0]
+        indices = []
+        values = []
+        for entries in row_dicts:
+            for j in sorted(entries):
+                value = entries[j]
+                if value:
+                    indices.append(j)
+                    values.append(value)
+            indptr.append(len(indices))
+        return cls.from_csr(rows, cols, indptr, indices, values, zero)
+
+    @classmethod
+    def from_coo(cls, shape, row_indices, col_indices, values):
+        rows, cols = shape
+        if rows <= 0 or cols <= 0:
+            raise ValueError("Размеры матрицы должны быть положительными")
+
+        row_indices, col_indices, values = as_list(row_indices), as_list(col_indices), as_list(values)
+        if not len(row_indices) == len(col_indices) == len(values):
+            raise ValueError("Списки индексов и значений должны иметь одинаковую длину")
+
+        zero = zero_of(values)
+        row_dicts = [{} for _ in range(rows)]
+        for i, j, value in zip(row_indices, col_indices, values):
+            if not (0 <= i < rows and 0 <= j < cols):
+                raise IndexError(f"Индекс ({i}, {j}) вне матрицы {rows}x{cols}")
+            # повторяющиеся позиции складываются
+            entries = row_dicts[i]
+            entries[j] = entries.get(j, zero) + value
+        return cls.from_row_dicts(rows, cols, row_dicts, zero)
+
+    @classmethod
+    def from_dense(cls, matrix):
+        if isinstance(matrix, SparseMatrix):
+            return matrix
+        if isinstance(matrix, (MatrixMixin, np.ndarray)):
+            return cls(np.asarray(matrix.data if isinstance(matrix, MatrixMixin) else matrix).tolist())
+        if isinstance(matrix, (Matrix, FlatMatrix)):
+            return cls(matrix.data)
+        return cls(matrix)
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    @property
+    def density(self):
+        return self.nnz / (self.rows * self.cols)
+
+    @property
+    def data(self):
+        result = [[self.zero] * self.cols for _ in range(self.rows)]
+        for i, row in enumerate(result):
+            for j, value in zip(*self.row_items(i)):
+                row[j] = value
+        return result
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.to_mixin().data, dtype=dtype)
+
+    def row_items(self, i):
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.values[start:end]
+
+    def row_ids(self):
+        return np.repeat(np.arange(self.rows), np.diff(self.indptr))
+
+    def to_coo(self):
+        return self.row_ids().tolist(), self.indices.tolist(), as_list(self.values)
+
+    def to_matrix(self):
+        return Matrix(self.data)
+
+    def to_flat(self):
+        return FlatMatrix(self.data)
+
+    def to_mixin(self):
+        result = np.zeros((self.rows, self.cols))
+        result[self.row_ids(), self.indices] = self.values
+        return MatrixMixin(result)
+
+    def check_shape(self, other, symbol):
+        if self.rows != other.rows or self.cols != other.cols:
+            raise ValueError(
+                f"Несовместимые размеры: {self.rows}x{self.cols} {symbol} {other.rows}x{other.cols}"
+            )
+
+    def filtered(self, row_ids, col_ids, values, zero):
+        # нули, получившиеся при вычислениях, в разреженный результат не попадают
+        kept = [(i, j, value) for i, j, value in zip(row_ids, col_ids, values) if value]
+        counts = [0] * self.rows
+        for i, _, _ in kept:
+            counts[i] += 1
+        indptr = [0]
+        for count in counts:
+            indptr.append(indptr[-1] + count)
+        return SparseMatrix.from_csr(
+            self.rows, self.cols, indptr, [j for _, j, _ in kept], [value for _, _, value in kept], zero,
+        )
+
+    def __add__(self, other):
+        if isinstance(other, SparseMatrix):
+            self.check_shape(other, "+")
+            zero = self.zero + other.zero
+
+            if (self.nnz + other.nnz) / (self.rows * self.cols) > DENSE_RESULT_THRESHOLD:
+                result = [[zero] * self.cols for _ in range(self.rows)]
+                for i, row in enumerate(result):
+                    for j, value in zip(*self.row_items(i)):
+                        row[j] = value
+                    for j, value in zip(*other.row_items(i)):
+                        row[j] += value
+                return Matrix(result)
+
+            row_dicts = []
+            for i in range(self.rows):
+                entries = dict(zip(*self.row_items(i)))
+                for j, value in zip(*other.row_items(i)):
+                    entries[j] = entries.get(j, zero) + value
+                row_dicts.append(entries)
+            return SparseMatrix.from_row_dicts(self.rows, self.cols, row_dicts, zero)
+
+        if isinstance(other, MatrixMixin):
+            self.check_shape(other, "+")
+            result = other.data.copy()
+            result[self.row_ids(), self.indices] += self.values
+            return MatrixMixin(result)
+
+        if isinstance(other, (Matrix, FlatMatrix)):
+            self.check_shape(other, "+")
+            result = [list(row) for row in other.data]
+            for i, row in enumerate(result):
+                for j, value in zip(*self.row_items(i)):
+                    row[j] += value
+            return type(other)(result)
+
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        if isinstance(other, SparseMatrix):
+            self.check_shape(other, "*")
+            row_dicts = []
+            for i in range(self.rows):
+                left = dict(zip(*self.row_items(i)))
+                row_dicts.append({j: left[j] * value for j, value in zip(*other.row_items(i)) if j in left})
+            return SparseMatrix.from_row_dicts(self.rows, self.cols, row_dicts, self.zero * other.zero)
+
+        if isinstance(other, DENSE_TYPES):
+            self.check_shape(other, "*")
+            row_ids = self.row_ids()
+            values = list(map(operator.mul, self.values, dense_values(other, row_ids, self.indices)))
+            return self.filtered(row_ids.tolist(), self.indices, values, self.zero * dense_zero(other))
+
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __matmul__(self, other):
+        if not isinstance(other, (SparseMatrix,) + DENSE_TYPES):
+            return NotImplemented
+
+        if self.cols != other.rows:
+            raise ValueError(
+                f"Несовместимые размеры для умножения: "
+                f"{self.rows}x{self.cols} @ {other.rows}x{other.cols}"
+            )
+
+        if isinstance(other, SparseMatrix):
+            return self.sparse_product(other)
+
+        if isinstance(other, MatrixMixin):
+            result = np.zeros((self.rows, other.cols))
+            for i in range(self.rows):
+                indices, values = self.row_items(i)
+                if indices:
+                    result[i] = np.asarray(values, dtype=np.float64) @ other.data[indices]
+            return MatrixMixin(result)
+
+        zero = self.zero * dense_zero(other)
+        other_rows = dense_rows(other)
+        result = []
+        for i in range(self.rows):
+            row = [zero] * other.cols
+            for k, value in zip(*self.row_items(i)):
+                row = list(map(operator.add, row, map(operator.mul, repeat(value), other_rows[k])))
+            result.append(row)
+        return type(other)(result)
+
+    def sparse_product(self, other):
+        zero = self.zero * other.zero
+        other_rows = [other.row_items(k) for k in range(other.rows)]
+
+        # ожидаемая плотность результата по числу умножений (алгоритм Густавсона)
+        row_nnz = np.diff(other.indptr)
+        flops = int(row_nnz[self.indices].sum()) if self.nnz else 0
+        if 1 - exp(-flops / (self.rows * other.cols)) > DENSE_RESULT_THRESHOLD:
+            result = []
+            for i in range(self.rows):
+                row = [zero] * other.cols
+                for k, left in zip(*self.row_items(i)):
+                    for j, right in zip(*other_rows[k]):
+                        row[j] += left * right
+                result.append(row)
+            return Matrix(result)
+
+        row_dicts = []
+        for i in range(self.rows):
+            entries = {}
+            for k, left in zip(*self.row_items(i)):
+                for j, right in zip(*other_rows[k]):
+                    entries[j] = entries.get(j, zero) + left * right
+            row_dicts.append(entries)
+        return SparseMatrix.from_row_dicts(self.rows, other.cols, row_dicts, zero)
+
+    def __rmatmul__(self, other):
+        if not isinstance(other, DENSE_TYPES):
+            return NotImplemented
+
+        if other.cols != self.rows:
+            raise ValueError(
+                f"Несовместимые размеры для умножения: "
+                f"{other.rows}x{other.cols} @ {self.rows}x{self.cols}"
+            )
+
+        zero = dense_zero(other) * self.zero
+        own_rows = [self.row_items(k) for k in range(self.rows)]
+        result = []
+        for other_row in dense_rows(other):
+            row = [zero] * self.cols
+            for left, (indices, values) in zip(other_row, own_rows):
+                if left:
+                    for j, right in zip(indices, values):
+                        row[j] += left * right
+            result.append(row)
+        if isinstance(other, MatrixMixin):
+            return MatrixMixin(result)
+        return type(other)(result)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        header = f"SparseMatrix({self.rows}x{self.cols}, nnz={self.nnz})"
+        if self.rows <= 10 and self.cols <= 10:
+            return header + ":\n" + "\n".join(str(self.to_matrix()).split("\n")[1:])
+        return header
+
+
+def random_sparse(rng, size, density):
+    count = max(1, round(density * size * size))
+    positions = rng.sample(range(size * size), count)
+    return SparseMatrix.from_coo(
+        (size, size),
+        [position // size for position in positions],
+        [position % size for position in positions],
+        [rng.random() for _ in positions],
+    )
+
+
+def best_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        time_start = perf_counter()
+        result = func()
+        times.append(perf_counter() - time_start)
+    return min(times), result
+
+
+def main():
+    rng = Random(0)
+    lines = [f"{'плотность':>9} {'операция':<12} {'Matrix, с':>10} {'Sparse, с':>10} {'ускорение':>10}  результат"]
+    crossover = {}
+
+    for density in BENCH_DENSITIES:
+        a = random_sparse(rng, BENCH_SIZE, density)
+        b = random_sparse(rng, BENCH_SIZE, density)
+        dense_a, dense_b = a.to_matrix(), b.to_matrix()
+
+        cases = [
+            ("A @ B", lambda: dense_a @ dense_b, lambda: a @ b),
+            ("A @ Matrix", lambda: dense_a @ dense_b, lambda: a @ dense_b),
+            ("A + B", lambda: dense_a + dense_b, lambda: a + b),
+            ("A * B", lambda: dense_a * dense_b, lambda: a * b),
+        ]
+        for name, dense_op, sparse_op in cases:
+            dense_time, _ = best_time(dense_op)
+            sparse_time, result = best_time(sparse_op)
+            if sparse_time >= dense_time:
+                crossover.setdefault(name, density)
+            lines.append(
+                f"{density:9.3f} {name:<12} {dense_time:10.4f} {sparse_time:10.4f} "
+                f"{dense_time / sparse_time:9.2f}x  {type(result).__name__}"
+            )
+
+    lines.append("")
+    lines.append(f"Размер матриц: {BENCH_SIZE}x{BENCH_SIZE}")
+    for name, _, _ in cases:
+        if name in crossover:
+            lines.append(f"{name:<12} разреженная матрица проигрывает с плотности {crossover[name]}")
+        else:
+            lines.append(f"{name:<12} разреженная матрица быстрее на всех плотностях")
+    print("\n".join(lines))
+
+    os.makedirs("./artifacts", exist_ok=True)
+    with open(DEFAULT_RESULT_PATH, "w", encoding="UTF-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()